@@ -5,7 +5,9 @@ from sqlalchemy import engine_from_config, pool
 from alembic import context
 
 config = context.config
-fileConfig(config.config_file_name)
+# When run in-process the app has already configured logging.
+if config.attributes.get("connection") is None:
+    fileConfig(config.config_file_name)
 
 
 db_url = os.getenv(
@@ -27,6 +29,13 @@ def run_migrations_offline():
 
 
 def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
         prefix="sqlalchemy.",
@@ -0,0 +1,38 @@
+"""add_id_to_history_order_index
+
+Revision ID: 4f7d2a9e8b16
+Revises: 9c1e4b7a2d53
+Create Date: 2025-06-09 15:20:44.702113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f7d2a9e8b16'
+down_revision: Union[str, None] = '9c1e4b7a2d53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_submissions_date_desc_fname_lname_id",
+        "submissions",
+        [sa.text("date DESC"), "first_name", "last_name", "id"],
+        unique=False,
+    )
+    op.drop_index("ix_submissions_date_desc_fname_lname", table_name="submissions")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_submissions_date_desc_fname_lname",
+        "submissions",
+        [sa.text("date DESC"), "first_name", "last_name"],
+        unique=False,
+    )
+    op.drop_index("ix_submissions_date_desc_fname_lname_id", table_name="submissions")
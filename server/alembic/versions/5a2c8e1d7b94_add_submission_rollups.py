@@ -0,0 +1,72 @@
+"""add_submission_rollups
+
+Revision ID: 5a2c8e1d7b94
+Revises: e6d09c3b7f41
+Create Date: 2025-06-18 11:42:07.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a2c8e1d7b94'
+down_revision: Union[str, None] = 'e6d09c3b7f41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "submission_totals",
+        sa.Column("shard", sa.SmallInteger(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("shard"),
+    )
+    op.create_table(
+        "submission_name_counts",
+        sa.Column("first_name", sa.String(length=100), nullable=False),
+        sa.Column("last_name", sa.String(length=100), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("first_name", "last_name"),
+    )
+    op.create_table(
+        "submission_date_counts",
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("shard", sa.SmallInteger(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("date", "shard"),
+    )
+
+    # Existing rows are counted into shard 0; new inserts spread across the
+    # other shards and readers sum them all.
+    op.execute(
+        """
+        INSERT INTO submission_totals (shard, count)
+        SELECT 0, COUNT(*) FROM submissions
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO submission_name_counts (first_name, last_name, count)
+        SELECT first_name, last_name, COUNT(*)
+        FROM submissions
+        GROUP BY first_name, last_name
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO submission_date_counts (date, shard, count)
+        SELECT date, 0, COUNT(*)
+        FROM submissions
+        GROUP BY date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("submission_date_counts")
+    op.drop_table("submission_name_counts")
+    op.drop_table("submission_totals")
@@ -0,0 +1,61 @@
+"""add_submission_counts
+
+Revision ID: 9c1e4b7a2d53
+Revises: 2801ec7ed18c
+Create Date: 2025-06-08 11:42:27.318904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e4b7a2d53'
+down_revision: Union[str, None] = '2801ec7ed18c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "submission_counts",
+        sa.Column("first_name", sa.String(length=100), nullable=False),
+        sa.Column("last_name", sa.String(length=100), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("day_count", sa.Integer(), nullable=False),
+        sa.Column("prior_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("first_name", "last_name", "date"),
+    )
+    op.execute(
+        """
+        INSERT INTO submission_counts (first_name, last_name, date, day_count, prior_count)
+        SELECT
+            first_name,
+            last_name,
+            date,
+            COUNT(*),
+            COALESCE(
+                SUM(COUNT(*)) OVER (
+                    PARTITION BY first_name, last_name
+                    ORDER BY date
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ),
+                0
+            )
+        FROM submissions
+        GROUP BY first_name, last_name, date
+        """
+    )
+    op.create_index(
+        "ix_submissions_date_desc_fname_lname",
+        "submissions",
+        [sa.text("date DESC"), "first_name", "last_name"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_submissions_date_desc_fname_lname", table_name="submissions")
+    op.drop_table("submission_counts")
@@ -0,0 +1,44 @@
+"""add_seed_checkpoint_tables
+
+Revision ID: b3a81f5c6e20
+Revises: 4f7d2a9e8b16
+Create Date: 2025-06-14 10:05:51.226840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3a81f5c6e20'
+down_revision: Union[str, None] = '4f7d2a9e8b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "seed_runs",
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("target_count", sa.BigInteger(), nullable=False),
+        sa.Column("batch_size", sa.Integer(), nullable=False),
+        sa.Column("total_batches", sa.Integer(), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("random_seed", sa.BigInteger(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.create_table(
+        "seed_batches",
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("batch_no", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name", "batch_no"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("seed_batches")
+    op.drop_table("seed_runs")
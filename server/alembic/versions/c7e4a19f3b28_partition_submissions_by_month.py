@@ -0,0 +1,192 @@
+"""partition_submissions_by_month
+
+Revision ID: c7e4a19f3b28
+Revises: 8d3f6b2a1c57
+Create Date: 2025-06-23 10:05:31.927460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4a19f3b28'
+down_revision: Union[str, None] = '8d3f6b2a1c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Storage parameters cannot be set on a partitioned table, so the autovacuum
+# tuning from 8d3f6b2a1c57 is applied to every partition instead.
+AUTOVACUUM = (
+    "autovacuum_vacuum_insert_scale_factor = 0.01, "
+    "autovacuum_vacuum_insert_threshold = 10000"
+)
+
+# A month's partition is built detached, filled with any rows the default
+# partition already holds for that month, then attached. The temporary CHECK
+# constraint lets ATTACH skip its validation scan of the new table. The
+# default partition is locked against writes first: a row inserted into it
+# for that month between the move and ATTACH would make ATTACH fail.
+ENSURE_PARTITION = f"""
+CREATE OR REPLACE FUNCTION ensure_submissions_partition(month date)
+RETURNS boolean LANGUAGE plpgsql AS $$
+DECLARE
+    lower_bound date := date_trunc('month', month)::date;
+    upper_bound date := (date_trunc('month', month) + interval '1 month')::date;
+    partition_name text := 'submissions_' || to_char(month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE submissions)', partition_name);
+    EXECUTE format('ALTER TABLE %I SET ({AUTOVACUUM})', partition_name);
+    LOCK TABLE submissions_default IN SHARE ROW EXCLUSIVE MODE;
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM submissions_default '
+        'WHERE date >= %L AND date < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        lower_bound, upper_bound, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE %I ADD CONSTRAINT %I CHECK (date >= %L AND date < %L)',
+        partition_name, partition_name || '_bounds', lower_bound, upper_bound
+    );
+    EXECUTE format(
+        'ALTER TABLE submissions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, lower_bound, upper_bound
+    );
+    EXECUTE format(
+        'ALTER TABLE %I DROP CONSTRAINT %I', partition_name, partition_name || '_bounds'
+    );
+    RETURN true;
+END
+$$
+"""
+
+# Serialized on an advisory lock (db.partitions.PARTITION_LOCK_ID) so that
+# workers and the seeder never race to create the same month.
+ENSURE_PARTITIONS = """
+CREATE OR REPLACE FUNCTION ensure_submissions_partitions(first_month date, last_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', first_month)::date;
+    created integer := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(7115003);
+    WHILE month <= last_month LOOP
+        IF ensure_submissions_partition(month) THEN
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END
+$$
+"""
+
+
+def _create_indexes() -> None:
+    op.create_index(op.f('ix_submissions_date'), 'submissions', ['date'], unique=False)
+    op.create_index(op.f('ix_submissions_first_name'), 'submissions', ['first_name'], unique=False)
+    op.create_index(op.f('ix_submissions_last_name'), 'submissions', ['last_name'], unique=False)
+    op.create_index(
+        "ix_submissions_fname_lname_date",
+        "submissions",
+        ["first_name", "last_name", "date"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_submissions_date_desc_fname_lname_id",
+        "submissions",
+        [sa.text("date DESC"), "first_name", "last_name", "id"],
+        unique=False,
+    )
+
+
+def upgrade() -> None:
+    # The sequence would otherwise be dropped with the old table.
+    op.execute("ALTER SEQUENCE submissions_id_seq OWNED BY NONE")
+    op.rename_table("submissions", "submissions_unpartitioned")
+    op.execute(
+        """
+        CREATE TABLE submissions (
+            id integer NOT NULL DEFAULT nextval('submissions_id_seq'),
+            date date NOT NULL,
+            first_name varchar(100) NOT NULL,
+            last_name varchar(100) NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now()
+        ) PARTITION BY RANGE (date)
+        """
+    )
+    # Catches dates no month partition covers yet; ensure_submissions_partition
+    # moves them out when their month is created.
+    op.execute("CREATE TABLE submissions_default PARTITION OF submissions DEFAULT")
+    op.execute(f"ALTER TABLE submissions_default SET ({AUTOVACUUM})")
+    op.execute(ENSURE_PARTITION)
+    op.execute(ENSURE_PARTITIONS)
+
+    # One partition per month that has data, and the next few months.
+    op.execute(
+        """
+        SELECT ensure_submissions_partition(month)
+        FROM (
+            SELECT DISTINCT date_trunc('month', date)::date AS month
+            FROM submissions_unpartitioned
+        ) AS months
+        """
+    )
+    op.execute(
+        """
+        SELECT ensure_submissions_partitions(
+            current_date, (current_date + interval '3 months')::date
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO submissions (id, date, first_name, last_name, created_at)
+        SELECT id, date, first_name, last_name, created_at
+        FROM submissions_unpartitioned
+        """
+    )
+    op.drop_table("submissions_unpartitioned")
+
+    # Built after the load, per partition, instead of maintained row by row.
+    # The primary key has to include the partition key.
+    op.create_primary_key("submissions_pkey", "submissions", ["id", "date"])
+    _create_indexes()
+    op.execute("ALTER SEQUENCE submissions_id_seq OWNED BY submissions.id")
+
+
+def downgrade() -> None:
+    op.execute("ALTER SEQUENCE submissions_id_seq OWNED BY NONE")
+    op.rename_table("submissions", "submissions_partitioned")
+    op.execute(
+        """
+        CREATE TABLE submissions (
+            id integer NOT NULL DEFAULT nextval('submissions_id_seq'),
+            date date NOT NULL,
+            first_name varchar(100) NOT NULL,
+            last_name varchar(100) NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO submissions (id, date, first_name, last_name, created_at)
+        SELECT id, date, first_name, last_name, created_at
+        FROM submissions_partitioned
+        """
+    )
+    # Dropping the parent drops every attached partition with it.
+    op.drop_table("submissions_partitioned")
+    op.execute("DROP FUNCTION ensure_submissions_partitions(date, date)")
+    op.execute("DROP FUNCTION ensure_submissions_partition(date)")
+
+    op.create_primary_key("submissions_pkey", "submissions", ["id"])
+    _create_indexes()
+    op.execute(f"ALTER TABLE submissions SET ({AUTOVACUUM})")
+    op.execute("ALTER SEQUENCE submissions_id_seq OWNED BY submissions.id")
@@ -0,0 +1,30 @@
+"""add_params_to_seed_runs
+
+Revision ID: e6d09c3b7f41
+Revises: b3a81f5c6e20
+Create Date: 2025-06-16 09:31:12.584017
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6d09c3b7f41'
+down_revision: Union[str, None] = 'b3a81f5c6e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "seed_runs",
+        sa.Column("params", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("seed_runs", "params")
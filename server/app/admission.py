@@ -0,0 +1,328 @@
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, List, Optional, Sequence, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.metrics import Counter, Gauge
+from db.querylog import DbTime, current_db_time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ADMISSION_LIMIT = Gauge(
+    "admission_limit", "Current adaptive concurrency limit.", ("route",)
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests being served.", ("route",)
+)
+ADMISSION_QUEUED = Gauge(
+    "admission_queued", "Requests waiting for a slot.", ("route",)
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected",
+    "Requests shed by admission control.",
+    ("route", "reason"),
+)
+
+# Longest Retry-After ever suggested, in seconds.
+_MAX_RETRY_AFTER_S = 30
+
+
+class AdmissionRejected(Exception):
+    status_code: int
+    retry_after_s: int
+
+    def __init__(self, status_code: int, detail: str, retry_after_s: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after_s = retry_after_s
+
+
+class AdaptiveLimit:
+    """Concurrency limit for one group of routes that follows database
+    latency, after Netflix's gradient limiter.
+
+    Each request reports the database time it spent (statements plus pool
+    waits). A moving average of those samples is compared with the latency
+    seen without load: while it stays within ``tolerance`` times that
+    baseline the limit grows by about its square root per step, and as it
+    climbs past that the limit shrinks in proportion, at most by half. A
+    request turned away for lack of database capacity (pool acquire timeout,
+    full submission queue) cuts the limit by ``backoff``, the multiplicative
+    decrease of AIMD; deliberate 503s such as "still seeding" do not. Requests
+    that touch no database give no sample, so the random delay in
+    ``/submit`` does not count as latency.
+
+    Beyond the limit, up to ``queue_size`` requests wait in FIFO order for
+    at most ``queue_timeout_s``; the rest are rejected at once.
+    """
+
+    name: str
+    limit: float
+    in_flight: int
+    _min_limit: int
+    _max_limit: int
+    _queue_size: int
+    _queue_timeout_s: float
+    _tolerance: float
+    _smoothing: float
+    _backoff: float
+    _short_s: Optional[float]
+    _baseline_s: Optional[float]
+    _request_s: float
+    _waiters: "Deque[asyncio.Future[None]]"
+
+    # Weight of each sample in the latency average, and how fast the
+    # baseline follows it upward while the limit is not saturated.
+    SHORT_ALPHA = 0.1
+    BASELINE_ALPHA = 0.01
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int,
+        queue_size: int,
+        queue_timeout_s: float,
+        tolerance: float = 2.0,
+        smoothing: float = 0.05,
+        backoff: float = 0.9,
+    ) -> None:
+        self.name = name
+        self._min_limit = max(1, min_limit)
+        self._max_limit = max(self._min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self._min_limit), self._max_limit))
+        self.in_flight = 0
+        self._queue_size = queue_size
+        self._queue_timeout_s = queue_timeout_s
+        self._tolerance = tolerance
+        self._smoothing = smoothing
+        self._backoff = backoff
+        self._short_s = None
+        self._baseline_s = None
+        self._request_s = 0.0
+        self._waiters = deque()
+
+        ADMISSION_LIMIT.labels(name).set_function(lambda: int(self.limit))
+        ADMISSION_IN_FLIGHT.labels(name).set_function(lambda: self.in_flight)
+        ADMISSION_QUEUED.labels(name).set_function(lambda: len(self._waiters))
+
+    def retry_after_s(self) -> int:
+        # Time for the queue ahead to drain at the current rate.
+        drain_s = self._request_s * (len(self._waiters) + 1) / max(self.limit, 1.0)
+        return min(_MAX_RETRY_AFTER_S, max(1, math.ceil(drain_s)))
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self._queue_size:
+            ADMISSION_REJECTED.labels(self.name, "queue_full").inc()
+            raise AdmissionRejected(
+                429, "Too many requests queued", self.retry_after_s()
+            )
+
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The slot is handed over by release(), in_flight already counted.
+            await asyncio.wait_for(waiter, self._queue_timeout_s)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot in the same iteration the timeout fired
+                # (wait_for is built on asyncio.timeout since 3.12): the
+                # slot is already counted, so take it.
+                return
+            self._drop_waiter(waiter)
+            ADMISSION_REJECTED.labels(self.name, "queue_timeout").inc()
+            raise AdmissionRejected(
+                503, "Server overloaded", self.retry_after_s()
+            ) from None
+        except BaseException:
+            # Cancelled after being handed a slot: give it back.
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._drop_waiter(waiter)
+            raise
+
+    def release(
+        self, *, elapsed_s: float, db_s: Optional[float], overloaded: bool
+    ) -> None:
+        self._request_s += (elapsed_s - self._request_s) * self.SHORT_ALPHA
+        if overloaded:
+            self._set_limit(self.limit * self._backoff)
+        elif db_s:
+            self._sample(db_s)
+        self.in_flight -= 1
+        self._wake()
+
+    def suspend(self) -> None:
+        """Give back a held slot without reporting a sample."""
+        self.in_flight -= 1
+        self._wake()
+
+    def _sample(self, db_s: float) -> None:
+        if self._short_s is None or self._baseline_s is None:
+            self._short_s = self._baseline_s = db_s
+            return
+        self._short_s += (db_s - self._short_s) * self.SHORT_ALPHA
+        busy = self.in_flight >= self.limit / 2
+        if self._short_s < self._baseline_s:
+            self._baseline_s = self._short_s
+        elif not busy or self.limit <= self._min_limit:
+            # Slower with little load is the database's new normal (more
+            # data, a busier host), not queueing caused by this limit.
+            self._baseline_s += (self._short_s - self._baseline_s) * self.BASELINE_ALPHA
+
+        gradient = max(
+            0.5, min(1.0, self._tolerance * self._baseline_s / self._short_s)
+        )
+        # Only probe upward while the limit is actually being used.
+        if gradient == 1.0 and not busy:
+            return
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self._set_limit(self.limit + (target - self.limit) * self._smoothing)
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = min(max(limit, float(self._min_limit)), float(self._max_limit))
+
+    def _drop_waiter(self, waiter: "asyncio.Future[None]") -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+
+class AdmissionSlot:
+    """The slot one admitted request holds in its ``AdaptiveLimit``."""
+
+    limit: AdaptiveLimit
+    held: bool
+    _held_s: float
+    _since: float
+
+    def __init__(self, limit: AdaptiveLimit) -> None:
+        self.limit = limit
+        self.held = True
+        self._held_s = 0.0
+        self._since = time.perf_counter()
+
+    def elapsed_s(self) -> float:
+        """Time the slot has been held, not counting ``suspend()`` spans."""
+        if self.held:
+            return self._held_s + time.perf_counter() - self._since
+        return self._held_s
+
+    def suspend(self) -> None:
+        self._held_s = self.elapsed_s()
+        self.held = False
+        self.limit.suspend()
+
+    async def resume(self) -> None:
+        await self.limit.acquire()
+        self.held = True
+        self._since = time.perf_counter()
+
+
+# Set per request by AdmissionControlMiddleware; None outside limited routes.
+current_admission_slot: ContextVar[Optional[AdmissionSlot]] = ContextVar(
+    "current_admission_slot", default=None
+)
+
+
+@asynccontextmanager
+async def outside_admission_limit() -> AsyncIterator[None]:
+    """Give the request's slot back while it waits on something other than
+    the database, and queue for it again afterwards. Raises
+    ``AdmissionRejected`` if it cannot be had back."""
+    slot = current_admission_slot.get()
+    if slot is None or not slot.held:
+        yield
+        return
+    slot.suspend()
+    yield
+    await slot.resume()
+
+
+def _rejection(e: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        {"detail": str(e)},
+        status_code=e.status_code,
+        headers={"Retry-After": str(e.retry_after_s)},
+    )
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware admitting requests through the ``AdaptiveLimit`` of
+    their path prefix; other paths, and the ``exempt`` ones, pass straight
+    through. Shed requests get 429 (queue full) or 503 (queued too long)
+    with ``Retry-After``, also when they queue again after
+    ``outside_admission_limit``."""
+
+    def __init__(
+        self,
+        app,
+        limits: List[Tuple[str, AdaptiveLimit]],
+        exempt: Sequence[str] = (),
+    ) -> None:
+        self.app = app
+        self._exempt = frozenset(exempt)
+        # Longest prefix first, so "/submit/batch" could override "/submit".
+        self._limits = sorted(limits, key=lambda item: len(item[0]), reverse=True)
+
+    def _limit_for(self, path: str) -> Optional[AdaptiveLimit]:
+        if path in self._exempt:
+            return None
+        for prefix, limit in self._limits:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send) -> None:
+        limit = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limit.acquire()
+        except AdmissionRejected as e:
+            await _rejection(e)(scope, receive, send)
+            return
+
+        db_time = DbTime()
+        slot = AdmissionSlot(limit)
+        db_token = current_db_time.set(db_time)
+        slot_token = current_admission_slot.set(slot)
+        try:
+            await self.app(scope, receive, send)
+        except AdmissionRejected as e:
+            # Raised before the handler produced a response.
+            await _rejection(e)(scope, receive, send)
+        finally:
+            current_admission_slot.reset(slot_token)
+            current_db_time.reset(db_token)
+            if slot.held:
+                limit.release(
+                    elapsed_s=slot.elapsed_s(),
+                    db_s=db_time.seconds,
+                    overloaded=db_time.overloaded,
+                )
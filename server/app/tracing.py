@@ -1,9 +1,17 @@
+import os
 import time
+import random
+import asyncio
+import inspect
+import functools
+import tracemalloc
+import contextvars
 import psutil
 import objgraph
 from enum import Flag, auto
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Generator, Mapping, Optional, TypeVar
 from contextlib import ExitStack
+from collections.abc import Coroutine
 
 from opentelemetry import trace
 from opentelemetry.trace import Span, Tracer, Status, StatusCode
@@ -16,49 +24,159 @@ class TraceFeatures(Flag):
     OBJGRAPH = auto()
 
 
+# Fraction of traced calls that collect each feature. Features not listed
+# here are always collected when requested. Resource metrics are sampled
+# sparingly and object growth (a full heap walk) is off unless asked for.
+DEFAULT_SAMPLE_RATES: Dict[TraceFeatures, float] = {
+    TraceFeatures.METRICS: float(os.getenv("TRACE_METRICS_SAMPLE_RATE", "0.01")),
+    TraceFeatures.OBJGRAPH: float(os.getenv("TRACE_OBJGRAPH_SAMPLE_RATE", "0")),
+}
+
+SYSTEM_TOTAL_MEMORY_BYTES = psutil.virtual_memory().total or 1
+
+
+class TaskClock:
+    """CPU time and net traced allocations of one asyncio task, accumulated
+    step by step so that overlapping tasks are not charged for each other."""
+
+    __slots__ = ("cpu_s", "alloc_bytes", "_step_cpu", "_step_mem")
+
+    def __init__(self) -> None:
+        self.cpu_s = 0.0
+        self.alloc_bytes = 0
+        self._step_cpu: Optional[float] = None
+        self._step_mem = 0
+
+    def begin_step(self) -> None:
+        self._step_cpu = time.thread_time()
+        self._step_mem = _traced_bytes()
+
+    def end_step(self) -> None:
+        if self._step_cpu is not None:
+            self.cpu_s += time.thread_time() - self._step_cpu
+            self.alloc_bytes += _traced_bytes() - self._step_mem
+            self._step_cpu = None
+
+    def read(self) -> "tuple[float, int]":
+        # Includes the step currently running, which is the caller's own.
+        if self._step_cpu is None:
+            return self.cpu_s, self.alloc_bytes
+        return (
+            self.cpu_s + time.thread_time() - self._step_cpu,
+            self.alloc_bytes + _traced_bytes() - self._step_mem,
+        )
+
+
+_task_clock: contextvars.ContextVar[Optional[TaskClock]] = contextvars.ContextVar(
+    "task_clock", default=None
+)
+
+
+def _traced_bytes() -> int:
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def read_resource_usage() -> "tuple[float, int]":
+    """CPU seconds and net allocated bytes attributed to the caller so far:
+    its task's when running in a tracked task, its thread's otherwise."""
+    clock = _task_clock.get()
+    if clock is not None:
+        return clock.read()
+    return time.thread_time(), _traced_bytes()
+
+
+class _ClockedCoroutine(Coroutine):
+    """Coroutine wrapper that times each step the event loop runs."""
+
+    __slots__ = ("_coro", "_clock", "__weakref__")
+
+    def __init__(self, coro: Any) -> None:
+        self._coro = coro
+        self._clock = TaskClock()
+
+    def _step(self, method: Callable[..., Any], *args: Any) -> Any:
+        clock = self._clock
+        if _task_clock.get() is not clock:
+            # Runs inside the task's own context, so the binding sticks to
+            # this task and child tasks start from it until they bind theirs.
+            _task_clock.set(clock)
+        clock.begin_step()
+        try:
+            return method(*args)
+        finally:
+            clock.end_step()
+
+    def send(self, value: Any) -> Any:
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args: Any) -> Any:
+        return self._step(self._coro.throw, *args)
+
+    def close(self) -> None:
+        self._coro.close()
+
+    def __await__(self) -> Generator[Any, None, Any]:
+        return self._coro.__await__()
+
+    def __getattr__(self, name: str) -> Any:
+        # cr_frame, cr_await, __qualname__ etc. for task reprs and stacks.
+        return getattr(self._coro, name)
+
+
+def clocked_task_factory(
+    loop: asyncio.AbstractEventLoop, coro: Any, **kwargs: Any
+) -> "asyncio.Task[Any]":
+    if asyncio.iscoroutine(coro) and not isinstance(coro, _ClockedCoroutine):
+        coro = _ClockedCoroutine(coro)
+    return asyncio.Task(coro, loop=loop, **kwargs)
+
+
+def enable_resource_attribution(
+    loop: asyncio.AbstractEventLoop, *, tracemalloc_frames: int = 0
+) -> None:
+    """Track per-task CPU time for every task created on ``loop`` from now
+    on and, when ``tracemalloc_frames`` > 0, per-task net allocations."""
+    loop.set_task_factory(clocked_task_factory)
+    if tracemalloc_frames > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(tracemalloc_frames)
+
+
 class MetricsCollector:
     _start_time: Optional[float]
-    _start_cpu: Optional[psutil._common.pcputimes]
-    _start_mem: Any
+    _start_cpu: Optional[float]
+    _start_alloc: Optional[int]
 
     def __init__(self) -> None:
         self._start_time = None
         self._start_cpu = None
-        self._start_mem = None
+        self._start_alloc = None
 
     def start(self) -> None:
-        proc = psutil.Process()
         self._start_time = time.perf_counter()
-        self._start_cpu = proc.cpu_times()
-        self._start_mem = proc.memory_info()
+        self._start_cpu, self._start_alloc = read_resource_usage()
 
     def finish(self) -> Dict[str, Any]:
-        proc = psutil.Process()
         end_time = time.perf_counter()
+        end_cpu, end_alloc = read_resource_usage()
         assert self._start_time is not None, "MetricsCollector.start() must be called first"
         assert self._start_cpu is not None, "MetricsCollector.start() must be called first"
-        assert self._start_mem is not None, "MetricsCollector.start() must be called first"
-
-        end_cpu = proc.cpu_times()
-        end_mem = proc.memory_info()
+        assert self._start_alloc is not None, "MetricsCollector.start() must be called first"
 
         wall_s = end_time - self._start_time
-        cpu_user = end_cpu.user - self._start_cpu.user
-        cpu_sys = end_cpu.system - self._start_cpu.system
-        rss_delta = end_mem.rss - self._start_mem.rss
+        cpu_s = end_cpu - self._start_cpu
 
-        vm = psutil.virtual_memory()
-        total_bytes = vm.total or 1
-        rss_pct = (rss_delta / total_bytes) * 100
-
-        return {
+        metrics = {
             "execution_time_s": round(wall_s, 4),
-            "cpu.user_seconds": round(cpu_user, 4),
-            "cpu.system_seconds": round(cpu_sys, 4),
-            "memory.rss_delta_mb": round(rss_delta / 1024**2, 2),
-            "memory.rss_pct_of_sys": round(rss_pct, 2),
-            "system.total_memory_mb": round(total_bytes / 1024**2, 2),
+            "cpu.task_seconds": round(cpu_s, 6),
+            "system.total_memory_mb": round(SYSTEM_TOTAL_MEMORY_BYTES / 1024**2, 2),
         }
+        if tracemalloc.is_tracing():
+            alloc_delta = end_alloc - self._start_alloc
+            metrics["memory.alloc_net_kb"] = round(alloc_delta / 1024, 2)
+            metrics["memory.alloc_pct_of_sys"] = round(
+                alloc_delta / SYSTEM_TOTAL_MEMORY_BYTES * 100, 4
+            )
+        return metrics
 
 
 class ObjectGrowthCollector:
@@ -82,17 +200,51 @@ class ObjectGrowthCollector:
 
 
 class MemoryLeakDetector:
-    _threshold_pct: float
+    """Net bytes each traced name has allocated and not freed, summed over
+    its sampled calls. One call's delta is small and noisy; a name whose
+    total keeps growing holds on to memory. ``add`` returns the total each
+    time it passes another multiple of ``threshold_bytes``."""
+
+    _threshold_bytes: int
+    _totals: Dict[str, int]
+    _reported: Dict[str, int]
+
+    def __init__(self, threshold_bytes: int) -> None:
+        self._threshold_bytes = max(1, threshold_bytes)
+        self._totals = {}
+        self._reported = {}
+
+    def add(self, name: str, alloc_bytes: int) -> Optional[int]:
+        total = self._totals.get(name, 0) + alloc_bytes
+        self._totals[name] = total
+        level = total // self._threshold_bytes
+        if level <= self._reported.get(name, 0):
+            return None
+        self._reported[name] = level
+        return total
 
-    def __init__(self, threshold_pct: float = 10.0) -> None:
-        self._threshold_pct = threshold_pct
+    @property
+    def threshold_bytes(self) -> int:
+        return self._threshold_bytes
 
-    def check(self, rss_pct: float) -> bool:
-        return rss_pct > self._threshold_pct
 
-    @property
-    def threshold_pct(self) -> float:
-        return self._threshold_pct
+leak_detector = MemoryLeakDetector(
+    int(float(os.getenv("TRACE_LEAK_THRESHOLD_MB", "64")) * 1024**2)
+)
+
+
+def _sampled(
+    feature: TraceFeatures,
+    features: TraceFeatures,
+    sample_rates: Mapping[TraceFeatures, float],
+) -> bool:
+    if not (features & feature):
+        return False
+    rate = sample_rates.get(feature, 1.0)
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+_tracer = trace.get_tracer(__name__)
 
 
 class OpenTelemetryAsyncTrace:
@@ -105,7 +257,6 @@ class OpenTelemetryAsyncTrace:
     _span: Optional[Span]
     _metrics: Optional[MetricsCollector]
     _objg: Optional[ObjectGrowthCollector]
-    _leak_detector: Optional[MemoryLeakDetector]
 
     def __init__(
         self,
@@ -116,31 +267,29 @@ class OpenTelemetryAsyncTrace:
             TraceFeatures.TRANSACTION
             | TraceFeatures.SPAN
             | TraceFeatures.METRICS
-            | TraceFeatures.OBJGRAPH
         ),
-        memory_threshold_pct: float = 10.0,
+        sample_rates: Optional[Mapping[TraceFeatures, float]] = None,
     ) -> None:
         self._name = name
         self._op = op
         self._features = features
         self._stack = ExitStack()
-        self._tracer = trace.get_tracer(__name__)
+        self._tracer = _tracer
         self._transaction = None
         self._span = None
 
-        self._metrics = (
-            MetricsCollector() if (features & TraceFeatures.METRICS) else None
-        )
+        rates = DEFAULT_SAMPLE_RATES if sample_rates is None else {
+            **DEFAULT_SAMPLE_RATES, **sample_rates
+        }
+        collect_metrics = _sampled(TraceFeatures.METRICS, features, rates)
+        self._metrics = MetricsCollector() if collect_metrics else None
         self._objg = (
-            ObjectGrowthCollector() if (features & TraceFeatures.OBJGRAPH) else None
-        )
-        self._leak_detector = (
-            MemoryLeakDetector(memory_threshold_pct)
-            if (features & TraceFeatures.METRICS)
+            ObjectGrowthCollector()
+            if _sampled(TraceFeatures.OBJGRAPH, features, rates)
             else None
         )
 
-    async def __aenter__(self) -> "OpenTelemetryAsyncTrace":
+    def __enter__(self) -> "OpenTelemetryAsyncTrace":
         if self._features & TraceFeatures.TRANSACTION:
             tx_span = self._tracer.start_span(
                 name=self._name,
@@ -173,7 +322,7 @@ class OpenTelemetryAsyncTrace:
 
         return self
 
-    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> bool:
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> bool:
         target_span = self._span or self._transaction
 
         if self._metrics is not None and target_span is not None:
@@ -181,14 +330,18 @@ class OpenTelemetryAsyncTrace:
             for key, value in metrics_data.items():
                 target_span.set_attribute(key, value)
 
-            rss_pct = metrics_data["memory.rss_pct_of_sys"]
-            assert self._leak_detector is not None, "Leak detector must be initialized"
-            if self._leak_detector.check(rss_pct):
+            alloc_kb = metrics_data.get("memory.alloc_net_kb")
+            retained = (
+                leak_detector.add(self._name, int(alloc_kb * 1024))
+                if alloc_kb is not None
+                else None
+            )
+            if retained is not None:
                 target_span.add_event(
                     name="memory.leak.detected",
                     attributes={
-                        "threshold_pct": self._leak_detector.threshold_pct,
-                        "rss_pct": rss_pct,
+                        "threshold_mb": round(leak_detector.threshold_bytes / 1024**2, 2),
+                        "retained_mb": round(retained / 1024**2, 2),
                     },
                 )
                 target_span.set_status(
@@ -202,3 +355,46 @@ class OpenTelemetryAsyncTrace:
 
         self._stack.close()
         return False
+
+    async def __aenter__(self) -> "OpenTelemetryAsyncTrace":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> bool:
+        return self.__exit__(exc_type, exc_val, exc_tb)
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def traced(
+    name: Optional[str] = None,
+    *,
+    op: str = "function",
+    features: TraceFeatures = TraceFeatures.SPAN | TraceFeatures.METRICS,
+    sample_rates: Optional[Mapping[TraceFeatures, float]] = None,
+) -> Callable[[F], F]:
+    """Decorator form of OpenTelemetryAsyncTrace for sync and async functions."""
+
+    def decorator(func: F) -> F:
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                async with OpenTelemetryAsyncTrace(
+                    span_name, op=op, features=features, sample_rates=sample_rates
+                ):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with OpenTelemetryAsyncTrace(
+                span_name, op=op, features=features, sample_rates=sample_rates
+            ):
+                return func(*args, **kwargs)
+
+        return sync_wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -1,35 +1,86 @@
+import json
 import random
 import asyncio
-from typing import List
+import datetime
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from databases import Database
+from pydantic import ValidationError
 
-from db.crud import insert_submission, get_history
-from app.main import database
-from schemas.submission import ErrorResponse, SuccessResponse, HistoryItem, SubmitPayload
+from db.crud import (
+    copy_submissions,
+    insert_submission,
+    get_history,
+    get_history_json,
+    get_stats,
+    get_submission_count,
+)
+from db.batching import SubmissionQueueFull
+from db.export import SubmissionExport
+from db.pool import PoolAcquireTimeout
+from app.admission import outside_admission_limit
+from app.main import (
+    database,
+    read_database,
+    read_router,
+    seed_task,
+    submission_batcher,
+    BULK_SUBMIT_MAX_RECORDS,
+    HISTORY_DURING_SEED,
+    HISTORY_JSON_IN_DB,
+    HISTORY_SEED_WAIT_S,
+    HISTORY_PAGE_SIZE,
+    HISTORY_MAX_PAGE_SIZE,
+)
+from schemas.submission import (
+    BatchSubmitResponse,
+    ErrorResponse,
+    SuccessResponse,
+    HistoryCursor,
+    HistoryItem,
+    StatsResponse,
+    SubmissionCountResponse,
+    SubmitPayload,
+)
 
 router = APIRouter()
 
+_NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
 
 @router.post(
     "/submit",
     response_model=SuccessResponse,
-    responses={400: {"model": ErrorResponse}, 422: {}},
+    responses={400: {"model": ErrorResponse}, 422: {}, 503: {}},
 )
 async def submit_form(
     payload: SubmitPayload,
     db: Database = Depends(lambda: database),
 ):
-    await asyncio.sleep(random.uniform(0, 3))
+    # Simulated think time that puts no load on the database, so it is not
+    # spent holding an admission slot.
+    async with outside_admission_limit():
+        await asyncio.sleep(random.uniform(0, 3))
 
     try:
-        await insert_submission(
-            db,
-            date=payload.date,
-            first_name=payload.first_name,
-            last_name=payload.last_name,
-        )
+        if submission_batcher is not None:
+            await submission_batcher.submit(
+                date=payload.date,
+                first_name=payload.first_name,
+                last_name=payload.last_name,
+            )
+        else:
+            await insert_submission(
+                db,
+                date=payload.date,
+                first_name=payload.first_name,
+                last_name=payload.last_name,
+            )
+    except (SubmissionQueueFull, PoolAcquireTimeout) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -42,15 +93,261 @@ async def submit_form(
     return {"success": True, "data": data_list}
 
 
+async def _ndjson_records(request: Request) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in request.stream():
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def _json_array_records(request: Request) -> AsyncIterator[Any]:
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    for item in items:
+        yield item
+
+
+def _validate_record(item: Any) -> Tuple[Optional[SubmitPayload], Dict[str, List[str]]]:
+    """The payload, or errors keyed by field like the 422 that /submit
+    returns for the same record."""
+    try:
+        if isinstance(item, bytes):
+            payload = SubmitPayload.model_validate_json(item)
+        else:
+            payload = SubmitPayload.model_validate(item)
+    except ValidationError as e:
+        errors: Dict[str, List[str]] = {}
+        for error in e.errors():
+            field = str(error["loc"][-1]) if error["loc"] else "body"
+            errors.setdefault(field, []).append(error["msg"])
+        return None, errors
+    return payload, {}
+
+
+@router.post(
+    "/submit/batch",
+    response_model=BatchSubmitResponse,
+    response_model_exclude_none=True,
+    responses={
+        400: {"description": "Body is not a JSON array or NDJSON"},
+        413: {"description": "Too many records"},
+        503: {"description": "No database connection available"},
+    },
+)
+async def submit_batch(request: Request, db: Database = Depends(lambda: database)):
+    """Validates a JSON array or an NDJSON stream record by record and loads
+    the valid ones with COPY in a single transaction."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in _NDJSON_TYPES:
+        items = _ndjson_records(request)
+    else:
+        items = _json_array_records(request)
+
+    results: List[Dict[str, Any]] = []
+    records: List[Tuple[datetime.date, str, str]] = []
+    accepted: List[int] = []
+    index = 0
+    async for item in items:
+        if index >= BULK_SUBMIT_MAX_RECORDS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {BULK_SUBMIT_MAX_RECORDS} records per batch",
+            )
+        payload, errors = _validate_record(item)
+        if payload is None:
+            results.append({"index": index, "success": False, "error": errors})
+        else:
+            results.append({"index": index, "success": True})
+            records.append((payload.date, payload.first_name, payload.last_name))
+            accepted.append(index)
+        index += 1
+        if index % 1000 == 0:
+            # Large arrays are validated from memory; let other requests run.
+            await asyncio.sleep(0)
+
+    try:
+        row_ids = await copy_submissions(db, records)
+    except PoolAcquireTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for position, row_id in zip(accepted, row_ids):
+        results[position]["id"] = row_id
+
+    return {
+        "accepted": len(records),
+        "rejected": len(results) - len(records),
+        "results": results,
+    }
+
+
 @router.get(
     "/history",
     response_model=List[HistoryItem],
-    responses={500: {"description": "Database error"}}
+    responses={
+        400: {"description": "Invalid cursor"},
+        500: {"description": "Database error"},
+        503: {"description": "No database connection available, or seeding in progress"},
+    },
 )
-async def history(db: Database = Depends(lambda: database)):
+async def history(
+    response: Response,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    # Pages are cached until the NOTIFY of the next insert, so a miss must
+    # see every write committed before it: a lagging replica's page would
+    # be served for the whole TTL. Same reasoning as /submissions/count.
+    db: Database = Depends(lambda: read_database),
+):
+    try:
+        after = HistoryCursor.decode(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not seed_task.done and HISTORY_DURING_SEED != "partial":
+        if HISTORY_DURING_SEED != "wait" or not await seed_task.wait(HISTORY_SEED_WAIT_S):
+            raise HTTPException(
+                status_code=503,
+                detail="Seeding in progress",
+                headers={"Retry-After": str(max(1, int(HISTORY_SEED_WAIT_S)))},
+            )
+
+    try:
+        load = get_history_json if HISTORY_JSON_IN_DB else get_history
+        page, next_cursor = await load(
+            db,
+            limit=limit,
+            cursor=after,
+            first_name=first_name,
+            last_name=last_name,
+            date_from=date_from,
+            date_to=date_to,
+        )
+    except PoolAcquireTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    headers = {}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor.encode()
+
+    if HISTORY_JSON_IN_DB:
+        # Already the final document, in the same bytes the response model
+        # would produce.
+        return Response(content=page, media_type="application/json", headers=headers)
+
+    response.headers.update(headers)
+    return page
+
+
+@router.get(
+    "/stats",
+    response_model=StatsResponse,
+    response_model_exclude_none=True,
+    responses={400: {"description": "Incomplete name"}, 503: {}},
+)
+async def stats(
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date: Optional[datetime.date] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    db: Database = Depends(read_router.database),
+):
+    if (first_name is None) != (last_name is None):
+        raise HTTPException(
+            status_code=400, detail="first_name and last_name must be given together"
+        )
+
+    try:
+        return await get_stats(
+            db,
+            first_name=first_name,
+            last_name=last_name,
+            date=date,
+            date_from=date_from,
+            date_to=date_to,
+        )
+    except PoolAcquireTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/submissions/count",
+    response_model=SubmissionCountResponse,
+    response_model_exclude_none=True,
+    responses={503: {}},
+)
+async def submission_count(
+    first_name: str,
+    last_name: str,
+    before: Optional[datetime.date] = None,
+):
+    # Totals are cached and kept current by NOTIFY, which is only exact
+    # against the primary; lookups with ``before`` are not cached and may
+    # use a replica.
+    db = read_database if before is None else read_router.database()
+    try:
+        return await get_submission_count(
+            db, first_name=first_name, last_name=last_name, before=before
+        )
+    except PoolAcquireTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/submissions/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"application/x-ndjson": {}, "text/csv": {}}},
+        503: {"description": "No database connection available"},
+    },
+)
+async def export_submissions(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+):
+    export = SubmissionExport(
+        read_router.database(),
+        format=format,
+        first_name=first_name,
+        last_name=last_name,
+        date_from=date_from,
+        date_to=date_to,
+    )
     try:
-        records = await get_history(db)
+        await export.open()
+    except PoolAcquireTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    return records
+    # The stream closes the export when it ends; the background task covers
+    # a client that disconnects before the first chunk is pulled.
+    return StreamingResponse(
+        export.stream(),
+        media_type=export.media_type,
+        headers={"Content-Disposition": f'attachment; filename="submissions.{format}"'},
+        background=BackgroundTask(export.close),
+    )
@@ -0,0 +1,153 @@
+import asyncio
+import datetime
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from databases import Database
+
+from .crud import insert_submissions
+from .querylog import DbTime, current_db_time, mark_db_overloaded
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class SubmissionQueueFull(Exception):
+    pass
+
+
+# A queued record, the submitter's future and the submitter's DbTime.
+_Pending = Tuple[Dict[str, Any], "asyncio.Future[int]", Optional[DbTime]]
+
+
+class SubmissionBatcher:
+    """Write-behind queue that turns concurrent submissions into one
+    multi-row insert per flush.
+
+    The flush runs in the batcher's task, so the database time it takes
+    (statements and pool waits), and whether it ran out of connections, is
+    credited to each submitter's request for admission control.
+    """
+
+    _db: Database
+    _max_size: int
+    _max_delay_s: float
+    _enqueue_timeout_s: float
+    _queue_size: int
+    _slots: asyncio.Semaphore
+    _queue: "asyncio.Queue[Optional[_Pending]]"
+    _worker: Optional["asyncio.Task[None]"]
+    _closing: bool
+
+    def __init__(
+        self,
+        db: Database,
+        *,
+        max_size: int = 100,
+        max_delay_s: float = 0.01,
+        queue_size: int = 10_000,
+        enqueue_timeout_s: float = 1.0,
+    ) -> None:
+        self._db = db
+        self._max_size = max_size
+        self._max_delay_s = max_delay_s
+        self._enqueue_timeout_s = enqueue_timeout_s
+        self._queue_size = queue_size
+        # Bounds accepted-but-unflushed submissions. The queue itself is
+        # unbounded so enqueueing never awaits after the closing check.
+        self._slots = asyncio.Semaphore(queue_size)
+        self._queue = asyncio.Queue()
+        self._worker = None
+        self._closing = False
+
+    async def start(self) -> None:
+        if self._worker is None:
+            self._closing = False
+            self._worker = asyncio.create_task(self._run())
+            logger.info(
+                f"Submission batching enabled (max_size={self._max_size}, "
+                f"max_delay_s={self._max_delay_s}, queue_size={self._queue_size})"
+            )
+
+    async def stop(self) -> None:
+        if self._worker is None:
+            return
+        self._closing = True
+        # The sentinel queues behind everything already accepted, so the
+        # worker flushes all of it before exiting.
+        self._queue.put_nowait(None)
+        await self._worker
+        self._worker = None
+        logger.info("Submission batcher drained.")
+
+    async def submit(
+        self, *, date: datetime.date, first_name: str, last_name: str
+    ) -> int:
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self._enqueue_timeout_s)
+        except asyncio.TimeoutError:
+            mark_db_overloaded()
+            raise SubmissionQueueFull(
+                f"Submission queue full ({self._queue_size} pending)"
+            )
+        if self._closing or self._worker is None:
+            self._slots.release()
+            raise SubmissionQueueFull("Submission batcher is not accepting writes")
+
+        future: "asyncio.Future[int]" = asyncio.get_running_loop().create_future()
+        record = {"date": date, "first_name": first_name, "last_name": last_name}
+        self._queue.put_nowait((record, future, current_db_time.get()))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self._max_delay_s
+            while len(batch) < self._max_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[_Pending]) -> None:
+        flush_time = DbTime()
+        token = current_db_time.set(flush_time)
+        try:
+            row_ids = await insert_submissions(
+                self._db, [record for record, _, _ in batch]
+            )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _), row_id in zip(batch, row_ids):
+                if not future.done():
+                    future.set_result(row_id)
+        finally:
+            current_db_time.reset(token)
+            for _, _, db_time in batch:
+                if db_time is not None:
+                    db_time.seconds += flush_time.seconds
+                    db_time.overloaded |= flush_time.overloaded
+                self._slots.release()
@@ -0,0 +1,276 @@
+import os
+import time
+import socket
+import asyncio
+import logging
+import datetime
+import functools
+from collections import OrderedDict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Optional,
+    Tuple,
+)
+
+import asyncpg
+from opentelemetry import trace
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def origin() -> str:
+    """NOTIFY payload identifying this process, so its own notifications
+    can be told apart from other workers'. Read per call because workers
+    may be forked after import."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class QueryCache:
+    _name: str
+    _maxsize: int
+    _ttl_s: float
+    _entries: "OrderedDict[Hashable, Tuple[float, Any]]"
+    _inflight: Dict[Hashable, "asyncio.Task[Any]"]
+    _generation: int
+
+    def __init__(self, name: str, *, maxsize: int = 256, ttl_s: float = 5.0) -> None:
+        self._name = name
+        self._maxsize = maxsize
+        self._ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        span = trace.get_current_span()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._report(span, hit=True)
+            return entry[1]
+
+        self.misses += 1
+        self._report(span, hit=False)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(
+                functools.partial(self._on_loaded, key, self._generation)
+            )
+        else:
+            span.set_attribute("cache.coalesced", True)
+
+        # Shielded so that a cancelled caller does not cancel the load the
+        # other coalesced callers are waiting on.
+        return await asyncio.shield(task)
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        # Loads already in flight may have read pre-invalidation data; new
+        # callers must start their own.
+        self._inflight.clear()
+
+    def _on_loaded(
+        self, key: Hashable, generation: int, task: "asyncio.Task[Any]"
+    ) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if generation != self._generation or self._maxsize <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + self._ttl_s, task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def _report(self, span: trace.Span, *, hit: bool) -> None:
+        span.set_attribute("cache.name", self._name)
+        span.set_attribute("cache.hit", hit)
+        span.set_attribute("cache.hits", self.hits)
+        span.set_attribute("cache.misses", self.misses)
+        span.set_attribute("cache.size", len(self._entries))
+
+
+NameCount = Tuple[int, Optional[datetime.date]]
+
+
+class NameCountCache:
+    """Bounded LRU of ``(count, last_date)`` per ``(first_name, last_name)``.
+
+    Entries are updated in place by this process's own inserts instead of
+    being dropped, so hot names stay cached under write load. Writes by other
+    workers invalidate the whole cache through NOTIFY.
+
+    Inserts bracket their transaction with ``begin_writes``/``end_writes``.
+    A concurrent load can see the new row as soon as it is committed, before
+    the inserting task resumes to apply ``record_insert``; such loads are
+    never stored, so the row is not counted twice.
+    """
+
+    _name: str
+    _maxsize: int
+    _entries: "OrderedDict[Tuple[str, str], NameCount]"
+    _generation: int
+    _writing: Dict[Tuple[str, str], int]
+
+    def __init__(self, name: str, *, maxsize: int = 10_000) -> None:
+        self._name = name
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._writing = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Tuple[str, str]) -> Optional[NameCount]:
+        span = trace.get_current_span()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        span.set_attribute("cache.name", self._name)
+        span.set_attribute("cache.hit", entry is not None)
+        span.set_attribute("cache.size", len(self._entries))
+        return entry
+
+    def put(self, key: Tuple[str, str], value: NameCount, generation: int) -> None:
+        # A load that raced an insert or an invalidation may have missed a
+        # row, or counted one that record_insert is about to add again;
+        # storing it would keep the wrong count until eviction.
+        if (
+            generation != self._generation
+            or key in self._writing
+            or self._maxsize <= 0
+        ):
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def begin_writes(self, keys: Iterable[Tuple[str, str]]) -> None:
+        """Mark ``keys`` as being inserted; call before the transaction."""
+        for key in keys:
+            self._writing[key] = self._writing.get(key, 0) + 1
+
+    def end_writes(self, keys: Iterable[Tuple[str, str]]) -> None:
+        """Close ``begin_writes`` after commit (and ``record_insert``) or
+        rollback. Loads that overlapped the write are not stored."""
+        for key in keys:
+            remaining = self._writing.pop(key) - 1
+            if remaining:
+                self._writing[key] = remaining
+        self._generation += 1
+
+    def record_insert(
+        self, key: Tuple[str, str], date: datetime.date, n: int = 1
+    ) -> None:
+        """Apply ``n`` committed inserts of ``key`` on ``date``."""
+        self._generation += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            count, last_date = entry
+            self._entries[key] = (
+                count + n,
+                date if last_date is None else max(last_date, date),
+            )
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+
+class CacheInvalidationListener:
+    """Invalidates local caches on Postgres NOTIFY so that every worker
+    process drops its entries when any of them writes.
+
+    ``write_through`` caches are kept current by this process's own writes,
+    so they are only invalidated by notifications from other processes.
+    """
+
+    _channel: str
+    _caches: Tuple[QueryCache, ...]
+    _write_through: Tuple[NameCountCache, ...]
+    _task: Optional["asyncio.Task[None]"]
+    _retry_s: float
+
+    def __init__(
+        self,
+        channel: str,
+        *caches: QueryCache,
+        write_through: Tuple[NameCountCache, ...] = (),
+        retry_s: float = 1.0,
+    ) -> None:
+        self._channel = channel
+        self._caches = caches
+        self._write_through = write_through
+        self._task = None
+        self._retry_s = retry_s
+
+    async def start(self, database_url: str) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(database_url))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _invalidate(self, *_: Any) -> None:
+        for cache in (*self._caches, *self._write_through):
+            cache.invalidate()
+
+    def _on_notify(self, conn: Any, pid: int, channel: str, payload: str) -> None:
+        for cache in self._caches:
+            cache.invalidate()
+        if payload != origin():
+            for cache in self._write_through:
+                cache.invalidate()
+
+    async def _listen(self, database_url: str) -> None:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(database_url)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self._channel, self._on_notify)
+                logger.info(f"Listening for cache invalidations on '{self._channel}'")
+                await lost.wait()
+                logger.warning(f"Lost LISTEN connection for '{self._channel}'")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            # Notifications may have been missed while disconnected.
+            self._invalidate()
+            await asyncio.sleep(self._retry_s)
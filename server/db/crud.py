@@ -1,24 +1,215 @@
+import os
+import asyncio
 import logging
 import datetime
-from typing import List, Dict, Any
+from collections import Counter
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 
-from sqlalchemy import select, and_, desc, func
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    Subquery,
+    Text,
+    and_,
+    desc,
+    func,
+    literal,
+    literal_column,
+    select,
+    text,
+    true,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from databases import Database
 from opentelemetry import trace
 
-from .models import submissions
+from .archive import submission_archive
+from .cache import QueryCache, NameCountCache, CacheInvalidationListener, origin
+from .models import (
+    submissions,
+    submission_counts,
+    submission_date_counts,
+    submission_name_counts,
+    submission_totals,
+)
+from .rollups import bump_rollups
+from schemas.submission import HistoryCursor
 from app.tracing import OpenTelemetryAsyncTrace, TraceFeatures
+from app.metrics import Histogram
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 tracer = trace.get_tracer(__name__)
 
+SUBMISSIONS_CHANNEL = "submissions_changed"
+
+history_cache = QueryCache(
+    "history",
+    maxsize=int(os.getenv("HISTORY_CACHE_MAX_ENTRIES", "256")),
+    ttl_s=float(os.getenv("HISTORY_CACHE_TTL_S", "5")),
+)
+name_count_cache = NameCountCache(
+    "name_count",
+    maxsize=int(os.getenv("NAME_COUNT_CACHE_MAX_ENTRIES", "10000")),
+)
+cache_invalidation = CacheInvalidationListener(
+    SUBMISSIONS_CHANNEL, history_cache, write_through=(name_count_cache,)
+)
+
+CRUD_DURATION = Histogram(
+    "crud_duration_seconds",
+    "Duration of submission reads and writes, including cache hits.",
+    ("operation",),
+)
+_insert_submission_duration = CRUD_DURATION.labels("insert_submission")
+_insert_submissions_duration = CRUD_DURATION.labels("insert_submissions")
+_get_history_duration = CRUD_DURATION.labels("get_history")
+_get_history_json_duration = CRUD_DURATION.labels("get_history_json")
+_get_submission_count_duration = CRUD_DURATION.labels("get_submission_count")
+_copy_submissions_duration = CRUD_DURATION.labels("copy_submissions")
+
+
+REBUILD_SUBMISSION_COUNTS = text(
+    """
+    WITH rebuilt AS (
+        SELECT
+            first_name,
+            last_name,
+            date,
+            COUNT(*) AS day_count,
+            COALESCE(
+                SUM(COUNT(*)) OVER (
+                    PARTITION BY first_name, last_name
+                    ORDER BY date
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ),
+                0
+            ) AS prior_count
+        FROM submissions
+        GROUP BY first_name, last_name, date
+    )
+    INSERT INTO submission_counts (first_name, last_name, date, day_count, prior_count)
+    SELECT first_name, last_name, date, day_count, prior_count FROM rebuilt
+    ON CONFLICT (first_name, last_name, date) DO UPDATE
+    SET day_count = EXCLUDED.day_count, prior_count = EXCLUDED.prior_count
+    """
+)
+
+
+# Updates of a name's submission_counts rows are serialized on an advisory
+# lock. Names are hashed into a fixed number of buckets, so even a bulk load
+# of many thousands of names holds at most NAME_LOCK_BUCKETS locks and stays
+# well within Postgres' shared lock table. Buckets are locked once each, in
+# bucket order, which every insert path does before its first update, so
+# the paths cannot deadlock. Two-key locks, in their own key space.
+NAME_LOCK_CLASS = 7_115_005
+NAME_LOCK_BUCKETS = 128
+
+LOCK_SUBMISSION_NAMES = f"""
+    SELECT pg_advisory_xact_lock({NAME_LOCK_CLASS}, bucket)
+    FROM (
+        SELECT DISTINCT
+            hashtext(first_name || ' ' || last_name) & {NAME_LOCK_BUCKETS - 1}
+                AS bucket
+        FROM unnest($1::varchar[], $2::varchar[]) AS u(first_name, last_name)
+    ) AS buckets
+    ORDER BY bucket
+"""
+
+# Set-based counterparts of _bump_submission_counts for bulk loads, run on
+# the raw connection with pre-aggregated, sorted arrays.
+
+BUMP_DAY_COUNTS = """
+    INSERT INTO submission_counts AS c
+        (first_name, last_name, date, day_count, prior_count)
+    SELECT first_name, last_name, date, n, 0
+    FROM unnest($1::varchar[], $2::varchar[], $3::date[], $4::int[])
+        AS u(first_name, last_name, date, n)
+    ON CONFLICT (first_name, last_name, date) DO UPDATE
+    SET day_count = c.day_count + EXCLUDED.day_count
+"""
+
+# Recomputes prior_count for every day of the given names; only rows whose
+# value changed are written.
+REFRESH_PRIOR_COUNTS = """
+    UPDATE submission_counts AS c
+    SET prior_count = r.prior_count
+    FROM (
+        SELECT
+            first_name,
+            last_name,
+            date,
+            COALESCE(
+                SUM(day_count) OVER (
+                    PARTITION BY first_name, last_name
+                    ORDER BY date
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ),
+                0
+            ) AS prior_count
+        FROM submission_counts
+        WHERE (first_name, last_name) IN (
+            SELECT * FROM unnest($1::varchar[], $2::varchar[])
+        )
+    ) AS r
+    WHERE c.first_name = r.first_name
+      AND c.last_name = r.last_name
+      AND c.date = r.date
+      AND c.prior_count <> r.prior_count
+"""
+
+
+async def _bump_submission_counts(
+    db: Database, *, date: datetime.date, first_name: str, last_name: str, n: int = 1
+) -> None:
+    same_name = and_(
+        submission_counts.c.first_name == first_name,
+        submission_counts.c.last_name == last_name,
+    )
+
+    await db.connection().raw_connection.fetch(
+        LOCK_SUBMISSION_NAMES, [first_name], [last_name]
+    )
+
+    prior = (
+        select(func.coalesce(func.sum(submission_counts.c.day_count), 0))
+        .where(and_(same_name, submission_counts.c.date < date))
+        .scalar_subquery()
+    )
+    upsert = pg_insert(submission_counts).values(
+        first_name=first_name,
+        last_name=last_name,
+        date=date,
+        day_count=n,
+        prior_count=prior,
+    )
+    await db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[
+                submission_counts.c.first_name,
+                submission_counts.c.last_name,
+                submission_counts.c.date,
+            ],
+            set_={"day_count": submission_counts.c.day_count + n},
+        )
+    )
+
+    await db.execute(
+        submission_counts.update()
+        .where(and_(same_name, submission_counts.c.date > date))
+        .values(prior_count=submission_counts.c.prior_count + n)
+    )
+
 
 async def insert_submission(
     db: Database, *, date: datetime.date, first_name: str, last_name: str
 ) -> int:
-    with tracer.start_as_current_span("crud.insert_submission") as span:
+    with _insert_submission_duration.time(), tracer.start_as_current_span(
+        "crud.insert_submission"
+    ) as span:
         span.set_attribute("first_name", first_name)
         span.set_attribute("last_name", last_name)
         span.set_attribute("date", date.isoformat())
@@ -27,67 +218,581 @@ async def insert_submission(
             first_name=first_name,
             last_name=last_name,
         )
+        name_keys = [(first_name, last_name)]
+        name_count_cache.begin_writes(name_keys)
         try:
-            row_id = await db.execute(query)
+            async with db.transaction():
+                row_id = await db.execute(query)
+                await _bump_submission_counts(
+                    db, date=date, first_name=first_name, last_name=last_name
+                )
+                await bump_rollups(
+                    db.connection().raw_connection,
+                    [(date, first_name, last_name)],
+                    shard_key=row_id,
+                )
+                await db.execute(select(func.pg_notify(SUBMISSIONS_CHANNEL, origin())))
+            history_cache.invalidate()
+            name_count_cache.record_insert((first_name, last_name), date)
             logger.info(f"Inserted submission id={row_id}")
             return row_id
         except Exception as e:
             logger.error(f"Error inserting submission: {e}")
             span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
             raise
+        finally:
+            name_count_cache.end_writes(name_keys)
 
 
-async def get_history(db: Database) -> List[Dict[str, Any]]:
-    async with OpenTelemetryAsyncTrace(
-        name="crud.get_history",
-        op="crud",
-        features=TraceFeatures.SPAN | TraceFeatures.METRICS,
-    ):
-        logger.info("Fetching last 10 submissions with prior-count")
-        s1 = submissions.alias("s1")
-        s2 = submissions.alias("s2")
-
-        subq = (
-            select(func.count())
-            .select_from(s2)
-            .where(
-                and_(
-                    s2.c.first_name == s1.c.first_name,
-                    s2.c.last_name == s1.c.last_name,
-                    s2.c.date < s1.c.date,
+async def insert_submissions(db: Database, records: List[Dict[str, Any]]) -> List[int]:
+    """Insert many submissions in one transaction and return their ids in
+    input order."""
+    if not records:
+        return []
+
+    with _insert_submissions_duration.time(), tracer.start_as_current_span(
+        "crud.insert_submissions"
+    ) as span:
+        span.set_attribute("batch.size", len(records))
+        name_keys = sorted(
+            {(record["first_name"], record["last_name"]) for record in records}
+        )
+        name_count_cache.begin_writes(name_keys)
+        try:
+            async with db.transaction():
+                # Ids are drawn up front so each record is matched to its own
+                # id without relying on the order of INSERT ... RETURNING.
+                id_rows = await db.fetch_all(
+                    text(
+                        "SELECT nextval('submissions_id_seq') AS id "
+                        "FROM generate_series(1, :n)"
+                    ).bindparams(n=len(records))
                 )
-            )
-            .correlate(s1)
-            .scalar_subquery()
+                row_ids = [int(row["id"]) for row in id_rows]
+                await db.execute(
+                    submissions.insert().values(
+                        [
+                            {
+                                "id": row_id,
+                                "date": record["date"],
+                                "first_name": record["first_name"],
+                                "last_name": record["last_name"],
+                            }
+                            for row_id, record in zip(row_ids, records)
+                        ]
+                    )
+                )
+
+                groups = Counter(
+                    (record["first_name"], record["last_name"], record["date"])
+                    for record in records
+                )
+                # All name locks up front; the per-group updates below
+                # re-enter them without waiting.
+                await db.connection().raw_connection.fetch(
+                    LOCK_SUBMISSION_NAMES,
+                    [first_name for first_name, _ in name_keys],
+                    [last_name for _, last_name in name_keys],
+                )
+                for (first_name, last_name, date), n in sorted(groups.items()):
+                    await _bump_submission_counts(
+                        db, date=date, first_name=first_name, last_name=last_name, n=n
+                    )
+                await bump_rollups(
+                    db.connection().raw_connection,
+                    [
+                        (record["date"], record["first_name"], record["last_name"])
+                        for record in records
+                    ],
+                    shard_key=row_ids[-1],
+                )
+                await db.execute(select(func.pg_notify(SUBMISSIONS_CHANNEL, origin())))
+            history_cache.invalidate()
+            for (first_name, last_name, date), n in groups.items():
+                name_count_cache.record_insert((first_name, last_name), date, n)
+            logger.info(f"Inserted batch of {len(row_ids)} submissions")
+            return row_ids
+        except Exception as e:
+            logger.error(f"Error inserting submission batch: {e}")
+            span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            name_count_cache.end_writes(name_keys)
+
+
+async def copy_submissions(
+    db: Database, records: List[Tuple[datetime.date, str, str]]
+) -> List[int]:
+    """Load ``(date, first_name, last_name)`` records with COPY in one
+    transaction and return their ids in input order.
+
+    Counts and rollups are maintained with a fixed number of set-based
+    statements rather than per name, so the cost grows with the number of
+    distinct names touched, not with round trips.
+    """
+    if not records:
+        return []
+
+    with _copy_submissions_duration.time(), tracer.start_as_current_span(
+        "crud.copy_submissions"
+    ) as span:
+        span.set_attribute("batch.size", len(records))
+        days = Counter(
+            (first_name, last_name, date) for date, first_name, last_name in records
         )
+        day_keys = sorted(days)
+        name_keys = sorted({key[:2] for key in days})
+        first_names = [first_name for first_name, _ in name_keys]
+        last_names = [last_name for _, last_name in name_keys]
+        name_count_cache.begin_writes(name_keys)
+        try:
+            async with db.transaction():
+                raw = db.connection().raw_connection
+                row_ids = [
+                    row[0]
+                    for row in await raw.fetch(
+                        "SELECT nextval('submissions_id_seq') "
+                        "FROM generate_series(1, $1)",
+                        len(records),
+                    )
+                ]
+                await raw.copy_records_to_table(
+                    "submissions",
+                    records=(
+                        (row_id, *record) for row_id, record in zip(row_ids, records)
+                    ),
+                    columns=["id", "date", "first_name", "last_name"],
+                )
+                # Taken before touching submission_counts, like every path.
+                await raw.fetch(LOCK_SUBMISSION_NAMES, first_names, last_names)
+                await raw.execute(
+                    BUMP_DAY_COUNTS,
+                    [first_name for first_name, _, _ in day_keys],
+                    [last_name for _, last_name, _ in day_keys],
+                    [date for _, _, date in day_keys],
+                    [days[key] for key in day_keys],
+                )
+                await raw.execute(REFRESH_PRIOR_COUNTS, first_names, last_names)
+                await bump_rollups(raw, records, shard_key=row_ids[-1])
+                await raw.execute(
+                    "SELECT pg_notify($1, $2)", SUBMISSIONS_CHANNEL, origin()
+                )
+            history_cache.invalidate()
+            for (first_name, last_name, date), n in days.items():
+                name_count_cache.record_insert((first_name, last_name), date, n)
+            logger.info(f"Copied batch of {len(row_ids)} submissions")
+            return row_ids
+        except Exception as e:
+            logger.error(f"Error copying submission batch: {e}")
+            span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            name_count_cache.end_writes(name_keys)
+
 
-        main_q = (
+def _history_query(
+    *,
+    limit: int = 10,
+    cursor: Optional[HistoryCursor] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> Select:
+    """One page of history plus one row, to tell whether another follows.
+    Columns: id, date, first_name, last_name, count."""
+    s = submissions
+    c = submission_counts
+
+    filters = []
+    if first_name is not None:
+        filters.append(s.c.first_name == first_name)
+    if last_name is not None:
+        filters.append(s.c.last_name == last_name)
+    if date_from is not None:
+        filters.append(s.c.date >= date_from)
+    if date_to is not None:
+        filters.append(s.c.date <= date_to)
+
+    def page(*conditions, order_by) -> Select:
+        return (
             select(
-                s1.c.date,
-                s1.c.first_name,
-                s1.c.last_name,
-                subq.label("count"),
+                s.c.id,
+                s.c.date,
+                s.c.first_name,
+                s.c.last_name,
+                c.c.prior_count.label("count"),
+            )
+            .select_from(
+                s.join(
+                    c,
+                    and_(
+                        c.c.first_name == s.c.first_name,
+                        c.c.last_name == s.c.last_name,
+                        c.c.date == s.c.date,
+                    ),
+                )
+            )
+            .where(*filters, *conditions)
+            .order_by(*order_by)
+            .limit(limit + 1)
+        )
+
+    history_order = (desc(s.c.date), s.c.first_name, s.c.last_name, s.c.id)
+
+    if cursor is None:
+        return page(order_by=history_order)
+
+    # The order mixes DESC and ASC columns, so a single row-value
+    # comparison cannot express "after the cursor". Split it into the
+    # rest of the cursor's day and the strictly older days; each half
+    # is a plain index range scan, so deep pages cost the same as the
+    # first one.
+    same_day = page(
+        s.c.date == cursor.date,
+        tuple_(s.c.first_name, s.c.last_name, s.c.id)
+        > tuple_(cursor.first_name, cursor.last_name, cursor.id),
+        order_by=(s.c.first_name, s.c.last_name, s.c.id),
+    )
+    older_days = page(s.c.date < cursor.date, order_by=history_order)
+    both = union_all(same_day, older_days).subquery()
+    return (
+        select(both)
+        .order_by(
+            desc(both.c.date), both.c.first_name, both.c.last_name, both.c.id
+        )
+        .limit(limit + 1)
+    )
+
+
+def json_page(
+    rows: Subquery,
+    fields: Sequence[str],
+    *,
+    order_by: Sequence[ColumnElement],
+    limit: int,
+    cursor_fields: Sequence[str] = (),
+) -> Select:
+    """Render the first ``limit`` of ``rows`` as one JSON array in the
+    database, for list endpoints that return the document as is.
+
+    ``row_to_json`` of a row holding exactly ``fields`` is compact and keeps
+    their order, so the bytes match FastAPI's encoding of a response model
+    declaring the same fields in that order. The result also carries
+    ``more`` (whether ``rows`` has more than ``limit`` rows) and
+    ``cursor_<field>`` for each of ``cursor_fields`` of the last row
+    rendered.
+    """
+    numbered = select(
+        rows, func.row_number().over(order_by=order_by).label("n")
+    ).subquery("numbered")
+    item = (
+        select(*(numbered.c[field] for field in fields))
+        .correlate(numbered)
+        .lateral("item")
+    )
+    in_page = numbered.c.n <= limit
+    rendered = func.string_agg(
+        func.row_to_json(literal_column("item")).cast(Text),
+        aggregate_order_by(literal(","), numbered.c.n),
+    ).filter(in_page)
+    return select(
+        func.coalesce(literal("[") + rendered + literal("]"), literal("[]")).label(
+            "body"
+        ),
+        (func.count() > limit).label("more"),
+        *(
+            func.max(numbered.c[field])
+            .filter(numbered.c.n == limit)
+            .label(f"cursor_{field}")
+            for field in cursor_fields
+        ),
+    ).select_from(numbered.join(item, true()))
+
+
+async def _fetch_history(
+    db: Database,
+    *,
+    limit: int = 10,
+    cursor: Optional[HistoryCursor] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[HistoryCursor]]:
+    logger.info(f"Fetching {limit} submissions with prior-count after cursor={cursor}")
+    main_q = _history_query(
+        limit=limit,
+        cursor=cursor,
+        first_name=first_name,
+        last_name=last_name,
+        date_from=date_from,
+        date_to=date_to,
+    )
+
+    try:
+        rows = await db.fetch_all(main_q)
+    except Exception as e:
+        logger.error(f"Error fetching history: {e}")
+        raise
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = HistoryCursor(
+            date=last["date"],
+            first_name=last["first_name"],
+            last_name=last["last_name"],
+            id=last["id"],
+        )
+
+    results = []
+    for row in rows:
+        results.append(
+            {
+                "date": row["date"].isoformat(),
+                "first_name": row["first_name"],
+                "last_name": row["last_name"],
+                "count": int(row["count"]),
+            }
+        )
+
+    logger.info(f"Returning {len(results)} history records")
+    return results, next_cursor
+
+
+async def get_history(
+    db: Database,
+    *,
+    limit: int = 10,
+    cursor: Optional[HistoryCursor] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[HistoryCursor]]:
+    with _get_history_duration.time():
+        async with OpenTelemetryAsyncTrace(
+            name="crud.get_history",
+            op="crud",
+            features=TraceFeatures.SPAN | TraceFeatures.METRICS,
+        ):
+            key = (
+                limit,
+                cursor.encode() if cursor is not None else None,
+                first_name,
+                last_name,
+                date_from,
+                date_to,
             )
-            .order_by(desc(s1.c.date), s1.c.first_name, s1.c.last_name)
-            .limit(10)
+            return await history_cache.get_or_load(
+                key,
+                lambda: _fetch_history(
+                    db,
+                    limit=limit,
+                    cursor=cursor,
+                    first_name=first_name,
+                    last_name=last_name,
+                    date_from=date_from,
+                    date_to=date_to,
+                ),
+            )
+
+
+async def _fetch_history_json(
+    db: Database,
+    *,
+    limit: int = 10,
+    cursor: Optional[HistoryCursor] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> Tuple[bytes, Optional[HistoryCursor]]:
+    page = _history_query(
+        limit=limit,
+        cursor=cursor,
+        first_name=first_name,
+        last_name=last_name,
+        date_from=date_from,
+        date_to=date_to,
+    ).subquery("page")
+    query = json_page(
+        page,
+        ("date", "first_name", "last_name", "count"),
+        order_by=(desc(page.c.date), page.c.first_name, page.c.last_name, page.c.id),
+        limit=limit,
+        cursor_fields=("date", "first_name", "last_name", "id"),
+    )
+
+    try:
+        row = await db.fetch_one(query)
+    except Exception as e:
+        logger.error(f"Error fetching history: {e}")
+        raise
+
+    next_cursor = None
+    if row["more"]:
+        next_cursor = HistoryCursor(
+            date=row["cursor_date"],
+            first_name=row["cursor_first_name"],
+            last_name=row["cursor_last_name"],
+            id=row["cursor_id"],
+        )
+    return row["body"].encode(), next_cursor
+
+
+async def get_history_json(
+    db: Database,
+    *,
+    limit: int = 10,
+    cursor: Optional[HistoryCursor] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> Tuple[bytes, Optional[HistoryCursor]]:
+    """``get_history`` with the page rendered to the final JSON body by
+    Postgres, skipping per-row Python objects and response validation."""
+    with _get_history_json_duration.time(), tracer.start_as_current_span(
+        "crud.get_history_json"
+    ):
+        key = (
+            "json",
+            limit,
+            cursor.encode() if cursor is not None else None,
+            first_name,
+            last_name,
+            date_from,
+            date_to,
         )
+        return await history_cache.get_or_load(
+            key,
+            lambda: _fetch_history_json(
+                db,
+                limit=limit,
+                cursor=cursor,
+                first_name=first_name,
+                last_name=last_name,
+                date_from=date_from,
+                date_to=date_to,
+            ),
+        )
+
+
+async def get_stats(
+    db: Database,
+    *,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    date: Optional[datetime.date] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> Dict[str, Any]:
+    """Exact counts from the rollup tables in one round trip: the total and
+    a name or single date cost a handful of row reads, a date range one row
+    per day and shard."""
+    with tracer.start_as_current_span("crud.get_stats"):
+        columns = [
+            select(func.coalesce(func.sum(submission_totals.c.count), 0))
+            .scalar_subquery()
+            .label("total")
+        ]
+        if first_name is not None and last_name is not None:
+            columns.append(
+                select(submission_name_counts.c.count)
+                .where(
+                    submission_name_counts.c.first_name == first_name,
+                    submission_name_counts.c.last_name == last_name,
+                )
+                .scalar_subquery()
+                .label("name_count")
+            )
+        if date is not None:
+            columns.append(
+                select(func.coalesce(func.sum(submission_date_counts.c.count), 0))
+                .where(submission_date_counts.c.date == date)
+                .scalar_subquery()
+                .label("date_count")
+            )
+        if date_from is not None or date_to is not None:
+            in_range = []
+            if date_from is not None:
+                in_range.append(submission_date_counts.c.date >= date_from)
+            if date_to is not None:
+                in_range.append(submission_date_counts.c.date <= date_to)
+            columns.append(
+                select(func.coalesce(func.sum(submission_date_counts.c.count), 0))
+                .where(*in_range)
+                .scalar_subquery()
+                .label("date_range_count")
+            )
 
         try:
-            rows = await db.fetch_all(main_q)
+            row = await db.fetch_one(select(*columns))
         except Exception as e:
-            logger.error(f"Error fetching history: {e}")
+            logger.error(f"Error fetching stats: {e}")
             raise
 
-        results = []
-        for row in rows:
-            results.append(
-                {
-                    "date": row["date"].isoformat(),
-                    "first_name": row["first_name"],
-                    "last_name": row["last_name"],
-                    "count": int(row["count"]),
-                }
+        # A name that was never submitted has no rollup row.
+        return {column.name: int(row[column.name] or 0) for column in columns}
+
+
+async def get_submission_count(
+    db: Database,
+    *,
+    first_name: str,
+    last_name: str,
+    before: Optional[datetime.date] = None,
+) -> Dict[str, Any]:
+    """Exact number of submissions for one name, optionally only those dated
+    before ``before``, and the latest date among them.
+
+    Both aggregates only need ``(first_name, last_name, date)``, so Postgres
+    answers from ix_submissions_fname_lname_date with an index-only scan.
+    Archived months are counted from ``submission_archive`` and added in.
+    Totals without ``before`` are served from ``name_count_cache``.
+    """
+    with _get_submission_count_duration.time(), tracer.start_as_current_span(
+        "crud.get_submission_count"
+    ):
+        key = (first_name, last_name)
+        cached = name_count_cache.get(key) if before is None else None
+        if cached is None:
+            generation = name_count_cache.generation
+            query = select(
+                func.count().label("count"),
+                func.max(submissions.c.date).label("last_date"),
+            ).where(
+                submissions.c.first_name == first_name,
+                submissions.c.last_name == last_name,
+            )
+            if before is not None:
+                query = query.where(submissions.c.date < before)
+            try:
+                row, (archived, archived_last_date) = await asyncio.gather(
+                    db.fetch_one(query),
+                    asyncio.to_thread(
+                        submission_archive.count, first_name, last_name, before
+                    ),
+                )
+            except Exception as e:
+                logger.error(f"Error counting submissions: {e}")
+                raise
+            last_dates = [d for d in (row["last_date"], archived_last_date) if d]
+            cached = (
+                int(row["count"]) + archived,
+                max(last_dates) if last_dates else None,
             )
+            if before is None:
+                name_count_cache.put(key, cached, generation)
 
-        logger.info(f"Returning {len(results)} history records")
-        return results
+        count, last_date = cached
+        return {
+            "first_name": first_name,
+            "last_name": last_name,
+            "before": before,
+            "count": count,
+            "last_date": last_date,
+        }
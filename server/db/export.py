@@ -0,0 +1,263 @@
+import io
+import os
+import csv
+import json
+import time
+import asyncio
+import logging
+import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from databases import Database
+
+from app.metrics import Counter
+from .archive import SubmissionArchive, submission_archive
+from .pool import acquire_connection, release_connection
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+EXPORT_FETCH_ROWS = int(os.getenv("EXPORT_FETCH_ROWS", "5000"))
+# COPY chunks buffered ahead of a slow client before the server is paused.
+EXPORT_COPY_BUFFER = int(os.getenv("EXPORT_COPY_BUFFER", "16"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+EXPORT_ROWS = Counter(
+    "export_rows", "Rows streamed by /submissions/export.", ("format",)
+)
+
+_COLUMNS = "id, date, first_name, last_name"
+
+
+def _export_query(
+    *,
+    first_name: Optional[str],
+    last_name: Optional[str],
+    date_from: Optional[datetime.date],
+    date_to: Optional[datetime.date],
+) -> Tuple[str, List[Any]]:
+    conditions: List[str] = []
+    args: List[Any] = []
+    for condition, value in (
+        ("first_name = ${}", first_name),
+        ("last_name = ${}", last_name),
+        ("date >= ${}", date_from),
+        ("date <= ${}", date_to),
+    ):
+        if value is not None:
+            args.append(value)
+            conditions.append(condition.format(len(args)))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Primary key order streams straight off an index, so the first rows
+    # leave before the scan is done instead of after a full sort.
+    return f"SELECT {_COLUMNS} FROM submissions{where} ORDER BY id", args
+
+
+def _ndjson_lines(rows: Sequence[Sequence[Any]]) -> bytes:
+    lines = [
+        json.dumps(
+            {
+                "id": id,
+                "date": date.isoformat(),
+                "first_name": first_name,
+                "last_name": last_name,
+            },
+            ensure_ascii=False,
+        )
+        for id, date, first_name, last_name in rows
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _csv_lines(rows: Sequence[Sequence[Any]]) -> bytes:
+    # Same dialect as COPY's CSV output, which follows these lines.
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode()
+
+
+class SubmissionExport:
+    """Streams submissions from one pooled connection in constant memory.
+
+    CSV is produced by Postgres with ``COPY ... TO STDOUT`` and passed
+    through; NDJSON is read from a server-side cursor ``fetch_rows`` at a
+    time. Both run inside one read-only repeatable-read transaction, so the
+    export is a consistent snapshot however long the client takes.
+
+    Matching rows from ``archive`` come first, month by month, in the same
+    format; the table's rows follow in id order.
+
+    ``open()`` acquires the connection up front so pool exhaustion can still
+    be answered with a status code; ``close()`` is idempotent and must run
+    whether or not the stream was consumed.
+    """
+
+    _db: Database
+    _format: str
+    _sql: str
+    _args: List[Any]
+    _filters: Dict[str, Any]
+    _archive: SubmissionArchive
+    _archived_months: List[datetime.date]
+    _fetch_rows: int
+    _connection: Any
+    _transaction: Any
+    rows: int
+
+    def __init__(
+        self,
+        db: Database,
+        *,
+        format: str = "ndjson",
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+        date_from: Optional[datetime.date] = None,
+        date_to: Optional[datetime.date] = None,
+        fetch_rows: int = EXPORT_FETCH_ROWS,
+        archive: SubmissionArchive = submission_archive,
+    ) -> None:
+        if format not in EXPORT_MEDIA_TYPES:
+            raise ValueError(f"Unsupported export format '{format}'")
+        self._db = db
+        self._format = format
+        self._filters = dict(
+            first_name=first_name,
+            last_name=last_name,
+            date_from=date_from,
+            date_to=date_to,
+        )
+        self._sql, self._args = _export_query(**self._filters)
+        self._archive = archive
+        self._archived_months = []
+        self._fetch_rows = fetch_rows
+        self._connection = None
+        self._transaction = None
+        self._rows = EXPORT_ROWS.labels(format)
+        self.rows = 0
+
+    @property
+    def media_type(self) -> str:
+        return EXPORT_MEDIA_TYPES[self._format]
+
+    async def open(self) -> None:
+        # The stream is consumed and closed from a different task than the
+        # one opening it, so not ``db.connection()``, which is task-bound.
+        connection = await acquire_connection(self._db)
+        self._connection = connection
+        try:
+            self._transaction = connection.transaction(
+                isolation="repeatable_read", readonly=True
+            )
+            await self._transaction.start()
+            # An export is paced by the client, not by query cost.
+            await connection.execute("SET LOCAL statement_timeout = 0")
+            self._archived_months = self._archive.months_between(
+                self._filters["date_from"], self._filters["date_to"]
+            )
+        except BaseException:
+            await self.close()
+            raise
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        start = time.perf_counter()
+        try:
+            if self._format == "csv":
+                yield _csv_lines([("id", "date", "first_name", "last_name")])
+                async for rows in self._archived_rows():
+                    yield _csv_lines(rows)
+                async for chunk in self._copy_csv():
+                    yield chunk
+            else:
+                async for rows in self._archived_rows():
+                    yield _ndjson_lines(rows)
+                async for chunk in self._cursor_ndjson():
+                    yield chunk
+            logger.info(
+                f"Exported {self.rows} submissions as {self._format} in "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+        except Exception as e:
+            logger.error(f"Export failed after {self.rows} rows: {e}")
+            raise
+        finally:
+            await self.close()
+
+    async def _cursor_ndjson(self) -> AsyncIterator[bytes]:
+        cursor = await self._connection.cursor(self._sql, *self._args)
+        while True:
+            rows = await cursor.fetch(self._fetch_rows)
+            if not rows:
+                return
+            self.rows += len(rows)
+            self._rows.inc(len(rows))
+            yield _ndjson_lines(rows)
+
+    async def _archived_rows(self) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        for month in self._archived_months:
+            chunks = self._archive.rows(
+                month, chunk_rows=self._fetch_rows, **self._filters
+            )
+            # Decoding a month file blocks, so it runs off the event loop.
+            while (rows := await asyncio.to_thread(next, chunks, None)) is not None:
+                self.rows += len(rows)
+                self._rows.inc(len(rows))
+                yield rows
+
+    async def _copy_csv(self) -> AsyncIterator[bytes]:
+        connection = self._connection
+        # COPY pushes into a callback. Holding it until the client has taken
+        # a chunk turns a slow client into backpressure on the connection
+        # instead of buffered memory.
+        chunks: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+        slots = asyncio.Semaphore(EXPORT_COPY_BUFFER)
+
+        async def output(chunk: bytes) -> None:
+            await slots.acquire()
+            chunks.put_nowait(chunk)
+
+        async def copy() -> str:
+            try:
+                return await connection.copy_from_query(
+                    self._sql, *self._args, output=output, format="csv"
+                )
+            finally:
+                chunks.put_nowait(None)
+
+        task = asyncio.ensure_future(copy())
+        try:
+            while (chunk := await chunks.get()) is not None:
+                slots.release()
+                yield chunk
+            status = await task
+        finally:
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+
+        # Status is "COPY <rows>".
+        copied = int(status.rsplit(" ", 1)[-1])
+        self.rows += copied
+        self._rows.inc(copied)
+
+    async def close(self) -> None:
+        connection, self._connection = self._connection, None
+        transaction, self._transaction = self._transaction, None
+        if connection is None:
+            return
+        try:
+            if transaction is not None:
+                await transaction.rollback()
+        except Exception as e:
+            # An abandoned COPY or cursor can leave the connection unusable;
+            # drop it rather than return it to the pool.
+            logger.warning(f"Discarding export connection: {e}")
+            connection.terminate()
+        finally:
+            await release_connection(self._db, connection)
@@ -1,85 +1,282 @@
 import os
+import time
 import asyncio
 import logging
-import subprocess
 import traceback
 
-from typing import Optional
-from .seed import SubmissionSeeder
+from typing import Any, Callable, Dict, Optional, Set
+
+import asyncpg
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from databases import Database
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from .seed import SEED_RUN_NAME, SubmissionSeeder
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+# Key for the session-level advisory lock that serializes migrations
+# across workers starting at the same time.
+MIGRATION_LOCK_ID = 7_115_001
+
+
+def _alembic_config(alembic_ini_path: Optional[str]) -> Config:
+    ini_file = alembic_ini_path or "alembic.ini"
+    ini_path = ini_file if os.path.isabs(ini_file) else os.path.join(os.getcwd(), ini_file)
+    if not os.path.exists(ini_path):
+        raise FileNotFoundError(f"alembic.ini not found at {ini_path}")
+    return Config(ini_path)
+
+
+async def _current_revisions(database: Database) -> Set[str]:
+    try:
+        rows = await database.fetch_all("SELECT version_num FROM alembic_version")
+    except asyncpg.UndefinedTableError:
+        return set()
+    return {row["version_num"] for row in rows}
+
+
 async def run_alembic_migrations(
+    database: Database,
+    database_url: str,
     alembic_ini_path: Optional[str] = None,
 ) -> None:
-    def do_upgrade():
-        cwd = os.getcwd()
-        ini_file = alembic_ini_path or "alembic.ini"
-        ini_path = ini_file if os.path.isabs(ini_file) else os.path.join(cwd, ini_file)
-
-        logger.info(f"Using alembic.ini at: {ini_path}")
-        if not os.path.exists(ini_path):
-            logger.error(f"alembic.ini not found at {ini_path}, skipping migrations")
-            return
-
-        env = os.environ.copy()
-        env["ALEMBIC_CONFIG"] = ini_path
-
-        db_url = os.getenv("DATABASE_URL")
-        if db_url:
-            env["DATABASE_URL"] = db_url
-            logger.info(f"Environment DATABASE_URL={db_url}")
-
-        logger.info("Starting Alembic migrations (upgrade head) via subprocess...")
-
-        proc = subprocess.run(
-            ["alembic", "upgrade", "head"],
-            cwd=cwd,
-            env=env,
-            capture_output=True,
-            text=True,
-        )
+    """Upgrade to head in-process. When ``alembic_version`` already matches
+    the script heads this is one query on the app's pool; otherwise the
+    upgrade runs on a dedicated connection under an advisory lock."""
+    started = time.perf_counter()
+    config = _alembic_config(alembic_ini_path)
+    heads = set(ScriptDirectory.from_config(config).get_heads())
 
-        stdout = proc.stdout.strip()
-        stderr = proc.stderr.strip()
+    current = await _current_revisions(database)
+    if current == heads:
+        logger.info(
+            f"Schema at head {sorted(heads)}; migrations skipped "
+            f"({(time.perf_counter() - started) * 1000:.1f} ms)"
+        )
+        return
 
-        if stdout:
-            logger.info(f"Alembic stdout:\n{stdout}")
-        if stderr:
-            logger.error(f"Alembic stderr:\n{stderr}")
+    logger.info(f"Schema at {sorted(current) or 'base'}, upgrading to {sorted(heads)}")
+    engine = create_async_engine(
+        database_url.replace("postgresql://", "postgresql+asyncpg://"),
+        poolclass=NullPool,
+    )
+    try:
+        async with engine.connect() as conn:
+            lock_started = time.perf_counter()
+            await conn.execute(select(func.pg_advisory_lock(MIGRATION_LOCK_ID)))
+            await conn.commit()
+            logger.info(
+                f"Migration lock acquired in "
+                f"{(time.perf_counter() - lock_started) * 1000:.1f} ms"
+            )
+            try:
+                # Another worker may have finished while this one waited.
+                current = await conn.run_sync(
+                    lambda sync_conn: set(
+                        MigrationContext.configure(sync_conn).get_current_heads()
+                    )
+                )
+                if current == heads:
+                    logger.info("Migrations already applied by another process")
+                else:
+                    upgrade_started = time.perf_counter()
 
-        if proc.returncode != 0:
-            raise RuntimeError(f"Alembic exited with code {proc.returncode}")
+                    def upgrade(sync_conn) -> None:
+                        config.attributes["connection"] = sync_conn
+                        command.upgrade(config, "head")
 
-        logger.info("Alembic migrations complete.")
+                    await conn.run_sync(upgrade)
+                    await conn.commit()
+                    logger.info(
+                        f"Alembic upgrade took "
+                        f"{(time.perf_counter() - upgrade_started) * 1000:.1f} ms"
+                    )
+            finally:
+                await conn.execute(select(func.pg_advisory_unlock(MIGRATION_LOCK_ID)))
+                await conn.commit()
+    finally:
+        await engine.dispose()
 
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, do_upgrade)
+    logger.info(
+        f"Alembic migrations complete "
+        f"({(time.perf_counter() - started) * 1000:.1f} ms)."
+    )
 
 
-async def run_seed_if_needed(
+def build_seeder(
     database_url: str,
     *,
     target_count: int = 2_000_000,
     batch_size: int = 1_000,
     threshold: int = 100_000,
     max_workers: Optional[int] = None,
-) -> None:
-    seeder = SubmissionSeeder(
+    use_copy: bool = True,
+    generator_workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+) -> SubmissionSeeder:
+    return SubmissionSeeder(
         database_url=database_url,
         target_count=target_count,
         batch_size=batch_size,
         threshold=threshold,
         max_workers=max_workers,
+        use_copy=use_copy,
+        generator_workers=generator_workers,
+        queue_size=queue_size,
     )
-    logger.info("Invoking async seeder...")
-    try:
-        await seeder.run()
-    except Exception:
-        logger.error("Seeder run failed. Traceback:")
-        tb = traceback.format_exc()
-        logger.error(tb)
-        raise
-    logger.info("Seeder finished.")
+
+
+# Held for the whole seed so that exactly one worker seeds at a time.
+SEED_LOCK_ID = 7_115_002
+
+SEED_PROGRESS_SQL = """
+    SELECT
+        r.total_batches,
+        r.completed_at IS NOT NULL AS completed,
+        (SELECT count(*) FROM seed_batches b WHERE b.name = r.name) AS batches_done
+    FROM seed_runs r
+    WHERE r.name = $1
+"""
+
+
+class SeedTask:
+    """Runs the seeder inline or as a managed background task and reports
+    its progress for the readiness endpoint.
+
+    With several workers, the one holding a session advisory lock seeds and
+    the others poll the checkpoint tables until the run completes. If the
+    seeding worker dies its lock is released and a waiting worker takes
+    over, resuming from the checkpoints.
+    """
+
+    _database_url: str
+    _poll_interval_s: float
+    _seeder: Optional[SubmissionSeeder]
+    _remote: Optional[Dict[str, Any]]
+    _task: Optional["asyncio.Task[None]"]
+    _done: asyncio.Event
+    _started: float
+    _finished: float
+    state: str
+    error: Optional[str]
+
+    def __init__(self, database_url: str, *, poll_interval_s: float = 1.0) -> None:
+        self._database_url = database_url
+        self._poll_interval_s = poll_interval_s
+        self._seeder = None
+        self._remote = None
+        self._task = None
+        self._done = asyncio.Event()
+        self._started = 0.0
+        self._finished = 0.0
+        self.state = "pending"
+        self.error = None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def disable(self) -> None:
+        """Seeding is handled elsewhere, e.g. by ``python -m db.seed``."""
+        self.state = "disabled"
+        self._done.set()
+
+    async def run(self, build: Callable[[], SubmissionSeeder]) -> None:
+        self.state = "waiting"
+        self._started = time.perf_counter()
+        conn = None
+        try:
+            conn = await asyncpg.connect(self._database_url)
+            while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", SEED_LOCK_ID):
+                row = await conn.fetchrow(SEED_PROGRESS_SQL, SEED_RUN_NAME)
+                self._remote = dict(row) if row is not None else None
+                if row is not None and row["completed"]:
+                    self.state = "complete"
+                    logger.info("Seeding completed by another worker.")
+                    return
+                await asyncio.sleep(self._poll_interval_s)
+
+            self._remote = None
+            self.state = "running"
+            self._seeder = build()
+            logger.info("Invoking async seeder...")
+            try:
+                await self._seeder.run()
+            finally:
+                await self._seeder.engine.dispose()
+            self.state = "complete"
+            logger.info("Seeder finished.")
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            logger.info("Seeding cancelled; it will resume on the next start.")
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error("Seeder run failed. Traceback:")
+            tb = traceback.format_exc()
+            logger.error(tb)
+            raise
+        finally:
+            self._finished = time.perf_counter()
+            self._done.set()
+            # Closing the session releases the advisory lock.
+            if conn is not None:
+                await conn.close()
+
+    def start(self, build: Callable[[], SubmissionSeeder]) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_in_background(build))
+
+    async def _run_in_background(self, build: Callable[[], SubmissionSeeder]) -> None:
+        try:
+            await self.run(build)
+        except Exception:
+            # Already logged; the failure is reported through status().
+            pass
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        try:
+            await asyncio.wait_for(asyncio.shield(self._done.wait()), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        status: Dict[str, Any] = {"state": self.state}
+        if self._seeder is not None:
+            status.update(self._seeder.progress())
+        elif self._remote is not None:
+            total = self._remote["total_batches"]
+            done = self._remote["batches_done"]
+            status.update(
+                {
+                    "phase": "seeded_by_another_worker",
+                    "batches_done": done,
+                    "batches_total": total,
+                    "percent": round(100 * done / total, 1) if total else None,
+                }
+            )
+        if self._started:
+            end = self._finished if self.done else time.perf_counter()
+            status["elapsed_s"] = round(end - self._started, 1)
+        if self.error is not None:
+            status["error"] = self.error
+        return status
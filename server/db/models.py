@@ -2,21 +2,89 @@ from sqlalchemy import (
     MetaData,
     Table,
     Column,
+    BigInteger,
     Integer,
+    SmallInteger,
     String,
     Date,
     DateTime,
+    PrimaryKeyConstraint,
     func,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 
 metadata = MetaData()
 
+# Range-partitioned by month on date; partitions are created by
+# ensure_submissions_partitions() (see db.partitions), not by create_all().
 submissions = Table(
     "submissions",
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
-    Column("date", Date, nullable=False, index=True),
+    Column("date", Date, primary_key=True, index=True),
     Column("first_name", String(100), nullable=False, index=True),
     Column("last_name", String(100), nullable=False, index=True),
-    Column("created_at", DateTime(timezone=True), server_default=func.now(), nullable=False)
+    Column("created_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+    postgresql_partition_by="RANGE (date)",
+)
+
+submission_counts = Table(
+    "submission_counts",
+    metadata,
+    Column("first_name", String(100), nullable=False),
+    Column("last_name", String(100), nullable=False),
+    Column("date", Date, nullable=False),
+    Column("day_count", Integer, nullable=False),
+    Column("prior_count", Integer, nullable=False),
+    PrimaryKeyConstraint("first_name", "last_name", "date"),
+)
+
+seed_runs = Table(
+    "seed_runs",
+    metadata,
+    Column("name", String(100), primary_key=True),
+    Column("target_count", BigInteger, nullable=False),
+    Column("batch_size", Integer, nullable=False),
+    Column("total_batches", Integer, nullable=False),
+    Column("start_date", Date, nullable=False),
+    Column("random_seed", BigInteger, nullable=False),
+    Column("params", JSONB, nullable=True),
+    Column("started_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+    Column("completed_at", DateTime(timezone=True), nullable=True),
+)
+
+seed_batches = Table(
+    "seed_batches",
+    metadata,
+    Column("name", String(100), nullable=False),
+    Column("batch_no", Integer, nullable=False),
+    PrimaryKeyConstraint("name", "batch_no"),
+)
+
+# Rollups kept current by every insert path. The total and per-date rows
+# are split across shards so that concurrent writers do not all queue on
+# one hot row; readers sum the shards.
+submission_totals = Table(
+    "submission_totals",
+    metadata,
+    Column("shard", SmallInteger, primary_key=True),
+    Column("count", BigInteger, nullable=False),
+)
+
+submission_name_counts = Table(
+    "submission_name_counts",
+    metadata,
+    Column("first_name", String(100), nullable=False),
+    Column("last_name", String(100), nullable=False),
+    Column("count", BigInteger, nullable=False),
+    PrimaryKeyConstraint("first_name", "last_name"),
+)
+
+submission_date_counts = Table(
+    "submission_date_counts",
+    metadata,
+    Column("date", Date, nullable=False),
+    Column("shard", SmallInteger, nullable=False),
+    Column("count", BigInteger, nullable=False),
+    PrimaryKeyConstraint("date", "shard"),
 )
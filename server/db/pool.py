@@ -0,0 +1,175 @@
+import time
+import asyncio
+import logging
+from typing import Any, Optional
+
+import asyncpg
+from databases import Database
+from opentelemetry import trace
+
+from app.metrics import Gauge, Histogram
+from .querylog import (
+    InstrumentedConnection,
+    add_db_time,
+    mark_db_overloaded,
+    pool_explainer,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DB_POOL_WAIT = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "Time spent waiting for a connection from the asyncpg pool.",
+    ("pool",),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Open pool connections by state.", ("pool", "state")
+)
+DB_POOL_MAX_CONNECTIONS = Gauge(
+    "db_pool_max_connections", "Configured pool maximum.", ("pool",)
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_waiting", "Callers currently waiting to acquire a connection.", ("pool",)
+)
+
+
+class PoolAcquireTimeout(Exception):
+    pass
+
+
+def create_database(
+    url: str,
+    *,
+    min_size: int,
+    max_size: int,
+    statement_timeout_ms: int = 0,
+) -> Database:
+    """Database with an explicitly sized pool. A non-zero statement timeout
+    is set per connection and enforced by the server."""
+    options: dict = {"min_size": min_size, "max_size": max_size}
+    if statement_timeout_ms > 0:
+        options["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+    return Database(url, **options)
+
+
+class TimedPool:
+    """Proxy for an asyncpg pool that records how long each acquire waits
+    and hands out connections whose statements are traced.
+
+    ``databases`` only awaits ``acquire()`` and calls ``release()`` and
+    ``close()``; everything else is passed through untouched.
+    """
+
+    _pool: asyncpg.Pool
+    _name: str
+    _acquire_timeout_s: Optional[float]
+    waiting: int
+
+    def __init__(
+        self, pool: asyncpg.Pool, *, name: str, acquire_timeout_s: Optional[float] = None
+    ) -> None:
+        self._pool = pool
+        self._name = name
+        self._acquire_timeout_s = acquire_timeout_s
+        self._explainer = pool_explainer(pool)
+        self._wait = DB_POOL_WAIT.labels(name)
+        self.waiting = 0
+
+        DB_POOL_CONNECTIONS.labels(name, "in_use").set_function(
+            lambda: pool.get_size() - pool.get_idle_size()
+        )
+        DB_POOL_CONNECTIONS.labels(name, "idle").set_function(pool.get_idle_size)
+        DB_POOL_MAX_CONNECTIONS.labels(name).set_function(pool.get_max_size)
+        DB_POOL_WAITING.labels(name).set_function(lambda: self.waiting)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+    async def acquire(
+        self, *, timeout: Optional[float] = None
+    ) -> InstrumentedConnection:
+        conn = await self.acquire_raw(timeout=timeout)
+        return InstrumentedConnection(
+            conn, source=self._name, explainer=self._explainer
+        )
+
+    async def acquire_raw(
+        self, *, timeout: Optional[float] = None
+    ) -> asyncpg.Connection:
+        """``acquire()`` without statement tracing, for callers that need
+        the asyncpg API itself (cursors, COPY)."""
+        if timeout is None:
+            timeout = self._acquire_timeout_s
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            conn = await self._pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            mark_db_overloaded()
+            raise PoolAcquireTimeout(
+                f"No '{self._name}' database connection available within {timeout}s"
+            )
+        finally:
+            self.waiting -= 1
+            waited = time.perf_counter() - start
+            self._wait.observe(waited)
+            add_db_time(waited)
+            trace.get_current_span().set_attribute(
+                "db.pool.wait_ms", round(waited * 1000, 3)
+            )
+        return conn
+
+    async def release(
+        self, conn: InstrumentedConnection, *, timeout: Optional[float] = None
+    ) -> None:
+        await self._pool.release(conn._conn, timeout=timeout)
+
+    async def release_raw(
+        self, conn: asyncpg.Connection, *, timeout: Optional[float] = None
+    ) -> None:
+        await self._pool.release(conn, timeout=timeout)
+
+
+def instrument_pool(
+    database: Database, *, name: str, acquire_timeout_s: Optional[float] = None
+) -> None:
+    """Wrap the connected database's pool so acquire waits, occupancy and
+    statements are measured. Must be called after ``database.connect()``."""
+    backend = database._backend
+    pool = getattr(backend, "_pool", None)
+    if pool is None:
+        logger.warning(f"Database '{name}' is not connected; pool not instrumented")
+        return
+    if not isinstance(pool, TimedPool):
+        backend._pool = TimedPool(pool, name=name, acquire_timeout_s=acquire_timeout_s)
+        logger.info(
+            f"Pool '{name}' ready (min={pool.get_min_size()}, max={pool.get_max_size()}, "
+            f"acquire_timeout_s={acquire_timeout_s})"
+        )
+
+
+def _pool(database: Database) -> Any:
+    pool = getattr(database._backend, "_pool", None)
+    if pool is None:
+        raise RuntimeError("Database is not connected")
+    return pool
+
+
+async def acquire_connection(database: Database) -> asyncpg.Connection:
+    """A plain asyncpg connection from ``database``'s pool that is not bound
+    to the current task, unlike ``database.connection()``: it can be opened
+    by a request handler and used and released by its response stream.
+    Return it with ``release_connection``."""
+    pool = _pool(database)
+    if isinstance(pool, TimedPool):
+        return await pool.acquire_raw()
+    return await pool.acquire()
+
+
+async def release_connection(database: Database, conn: asyncpg.Connection) -> None:
+    pool = _pool(database)
+    if isinstance(pool, TimedPool):
+        await pool.release_raw(conn)
+    else:
+        await pool.release(conn)
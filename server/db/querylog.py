@@ -0,0 +1,378 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import functools
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+import asyncpg
+from opentelemetry import trace
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+tracer = trace.get_tracer(__name__)
+
+QUERY_SLOW_MS = float(os.getenv("QUERY_SLOW_MS", "100"))
+QUERY_SLOW_LOG_SIZE = int(os.getenv("QUERY_SLOW_LOG_SIZE", "50"))
+# 0 disables EXPLAIN capture.
+QUERY_EXPLAIN_MS = float(os.getenv("QUERY_EXPLAIN_MS", "0"))
+QUERY_EXPLAIN_INTERVAL_S = float(os.getenv("QUERY_EXPLAIN_INTERVAL_S", "60"))
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of individual SQL statements by operation and source.",
+    ("operation", "source"),
+)
+
+Explainer = Callable[[str, Sequence[Any]], Awaitable[str]]
+
+
+class DbTime:
+    """Database time (statements and pool waits) spent for one request, and
+    whether the request was turned away for lack of database capacity."""
+
+    seconds: float
+    overloaded: bool
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.overloaded = False
+
+
+# Set per request by app.admission; None outside requests.
+current_db_time: ContextVar[Optional[DbTime]] = ContextVar(
+    "current_db_time", default=None
+)
+
+
+def add_db_time(seconds: float) -> None:
+    db_time = current_db_time.get()
+    if db_time is not None:
+        db_time.seconds += seconds
+
+
+def mark_db_overloaded() -> None:
+    db_time = current_db_time.get()
+    if db_time is not None:
+        db_time.overloaded = True
+
+
+_EXPLAINABLE = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|(?<![\w.])\d+(?:\.\d+)?\b")
+_REPEATED_GROUP = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """Normalize a statement so that calls differing only in literals,
+    placeholders or multi-row VALUES length share one fingerprint."""
+    normalized = _STRING.sub("?", sql)
+    normalized = _PARAM.sub("?", normalized)
+    normalized = _SPACE.sub(" ", normalized).strip()
+    normalized = _IN_LIST.sub("(?+)", normalized)
+    return _REPEATED_GROUP.sub(r"\1, ...", normalized)
+
+
+def _operation(sql: str) -> str:
+    head = sql.lstrip().split(None, 1)
+    return head[0].upper() if head else ""
+
+
+def _row_count(result: Any) -> Optional[int]:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, str):
+        # Command status such as "INSERT 0 5" or "UPDATE 3".
+        tail = result.rsplit(" ", 1)[-1]
+        return int(tail) if tail.isdigit() else None
+    return None
+
+
+@dataclass
+class SlowQuery:
+    fingerprint: str
+    source: str
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_ms: float = 0.0
+    last_rows: Optional[int] = None
+    last_seen: float = 0.0
+    explain: Optional[str] = None
+    explained_at: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["avg_ms"] = round(self.total_ms / self.calls, 3) if self.calls else 0.0
+        return data
+
+
+class SlowQueryLog:
+    """Bounded table of the slowest statements, one entry per fingerprint.
+    When full, a new fingerprint replaces the entry with the lowest max."""
+
+    _entries: Dict[str, SlowQuery]
+    _pending: Set["asyncio.Task[None]"]
+
+    def __init__(
+        self,
+        *,
+        threshold_ms: float,
+        maxsize: int,
+        explain_ms: float = 0.0,
+        explain_interval_s: float = 60.0,
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.maxsize = maxsize
+        self.explain_ms = explain_ms
+        self.explain_interval_s = explain_interval_s
+        self._entries = {}
+        self._pending = set()
+
+    def record(
+        self,
+        sql: str,
+        elapsed_ms: float,
+        rows: Optional[int],
+        *,
+        source: str,
+        args: Sequence[Any] = (),
+        explainer: Optional[Explainer] = None,
+    ) -> None:
+        if elapsed_ms < self.threshold_ms or self.maxsize <= 0:
+            return
+
+        key = fingerprint(sql)
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= self.maxsize:
+                fastest = min(self._entries.values(), key=lambda e: e.max_ms)
+                if fastest.max_ms >= elapsed_ms:
+                    return
+                del self._entries[fastest.fingerprint]
+            entry = self._entries[key] = SlowQuery(fingerprint=key, source=source)
+
+        now = time.time()
+        entry.calls += 1
+        entry.total_ms += elapsed_ms
+        entry.max_ms = max(entry.max_ms, elapsed_ms)
+        entry.last_ms = elapsed_ms
+        entry.last_rows = rows
+        entry.last_seen = now
+
+        if (
+            explainer is not None
+            and 0 < self.explain_ms <= elapsed_ms
+            and _operation(sql) in _EXPLAINABLE
+            and now - entry.explained_at >= self.explain_interval_s
+        ):
+            # Claimed before the task runs so concurrent slow calls do not
+            # all queue an EXPLAIN of the same statement.
+            entry.explained_at = now
+            task = asyncio.ensure_future(self._explain(entry, explainer, sql, args))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _explain(
+        self, entry: SlowQuery, explainer: Explainer, sql: str, args: Sequence[Any]
+    ) -> None:
+        try:
+            entry.explain = await explainer(sql, args)
+        except Exception as e:
+            logger.warning(f"EXPLAIN failed for slow query: {e}")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        entries = sorted(self._entries.values(), key=lambda e: e.max_ms, reverse=True)
+        return [entry.to_dict() for entry in entries]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+slow_queries = SlowQueryLog(
+    threshold_ms=QUERY_SLOW_MS,
+    maxsize=QUERY_SLOW_LOG_SIZE,
+    explain_ms=QUERY_EXPLAIN_MS,
+    explain_interval_s=QUERY_EXPLAIN_INTERVAL_S,
+)
+
+
+def _start_span(sql: str, operation: str, source: str) -> Span:
+    span = tracer.start_span(f"db.{operation.lower() or 'query'}", kind=SpanKind.CLIENT)
+    span.set_attribute("db.system", "postgresql")
+    span.set_attribute("db.operation", operation)
+    span.set_attribute("db.statement", fingerprint(sql))
+    span.set_attribute("db.source", source)
+    return span
+
+
+def _finish(
+    span: Span,
+    sql: str,
+    operation: str,
+    source: str,
+    elapsed_s: float,
+    rows: Optional[int],
+    *,
+    args: Sequence[Any] = (),
+    explainer: Optional[Explainer] = None,
+) -> None:
+    elapsed_ms = elapsed_s * 1000
+    span.set_attribute("db.duration_ms", round(elapsed_ms, 3))
+    if rows is not None:
+        span.set_attribute("db.rows", rows)
+    span.end()
+    DB_QUERY_DURATION.labels(operation, source).observe(elapsed_s)
+    add_db_time(elapsed_s)
+    slow_queries.record(
+        sql, elapsed_ms, rows, source=source, args=args, explainer=explainer
+    )
+
+
+class InstrumentedConnection:
+    """Proxy for an asyncpg connection that traces the statement methods
+    ``databases`` uses. It sees the final SQL text, so nothing is compiled
+    twice."""
+
+    _conn: asyncpg.Connection
+    _source: str
+    _explainer: Optional[Explainer]
+
+    def __init__(
+        self,
+        conn: asyncpg.Connection,
+        *,
+        source: str,
+        explainer: Optional[Explainer] = None,
+    ) -> None:
+        self._conn = conn
+        self._source = source
+        self._explainer = explainer
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    async def _run(
+        self,
+        method: Callable[..., Awaitable[Any]],
+        sql: str,
+        args: Sequence[Any],
+        count_rows: Callable[[Any], Optional[int]] = _row_count,
+    ) -> Any:
+        operation = _operation(sql)
+        span = _start_span(sql, operation, self._source)
+        start = time.perf_counter()
+        try:
+            with trace.use_span(span, end_on_exit=False):
+                result = await method(sql, *args)
+        except BaseException as e:
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            _finish(span, sql, operation, self._source, time.perf_counter() - start, None)
+            raise
+        _finish(
+            span,
+            sql,
+            operation,
+            self._source,
+            time.perf_counter() - start,
+            count_rows(result),
+            args=args,
+            explainer=self._explainer,
+        )
+        return result
+
+    async def fetch(self, sql: str, *args: Any) -> Any:
+        return await self._run(self._conn.fetch, sql, args)
+
+    async def fetchrow(self, sql: str, *args: Any) -> Any:
+        return await self._run(
+            self._conn.fetchrow, sql, args, lambda row: int(row is not None)
+        )
+
+    async def fetchval(self, sql: str, *args: Any) -> Any:
+        return await self._run(self._conn.fetchval, sql, args)
+
+    async def execute(self, sql: str, *args: Any) -> Any:
+        return await self._run(self._conn.execute, sql, args)
+
+
+def pool_explainer(pool: asyncpg.Pool) -> Explainer:
+    """EXPLAIN on a separate pooled connection, so the caller's connection
+    and transaction are never touched."""
+
+    async def explain(sql: str, args: Sequence[Any]) -> str:
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(f"EXPLAIN {sql}", *args)
+        return "\n".join(row[0] for row in rows)
+
+    return explain
+
+
+def instrument_engine(engine: AsyncEngine, *, source: str = "seed") -> None:
+    """Trace every statement an SQLAlchemy engine sends and feed the slow
+    query log. Statements issued through the raw driver connection, such as
+    COPY, are not seen."""
+
+    async def explain(sql: str, args: Sequence[Any]) -> str:
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            rows = await raw.driver_connection.fetch(f"EXPLAIN {sql}", *args)
+        return "\n".join(row[0] for row in rows)
+
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany) -> None:
+        operation = _operation(statement)
+        context._query_trace = (
+            _start_span(statement, operation, source),
+            operation,
+            time.perf_counter(),
+        )
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany) -> None:
+        span, operation, start = context._query_trace
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        _finish(
+            span,
+            statement,
+            operation,
+            source,
+            time.perf_counter() - start,
+            rows,
+            args=() if executemany else tuple(parameters or ()),
+            explainer=None if executemany else explain,
+        )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def on_error(exception_context) -> None:
+        context = exception_context.execution_context
+        query_trace = getattr(context, "_query_trace", None)
+        if query_trace is None:
+            return
+        span, operation, start = query_trace
+        span.set_status(
+            Status(StatusCode.ERROR, str(exception_context.original_exception))
+        )
+        _finish(
+            span,
+            exception_context.statement or "",
+            operation,
+            source,
+            time.perf_counter() - start,
+            None,
+        )
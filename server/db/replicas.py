@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from typing import List, Optional, Sequence
+
+from databases import Database
+
+from app.metrics import Gauge
+from .pool import instrument_pool
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Replay lag last measured on each replica.", ("replica",)
+)
+DB_REPLICA_HEALTHY = Gauge(
+    "db_replica_healthy", "1 while a replica is eligible for reads.", ("replica",)
+)
+
+# Lag is zero when the replica has replayed everything it received, so an
+# idle primary does not make a caught-up replica look stale. That also holds
+# for a replica cut off from the primary, so the WAL receiver must be
+# streaming and have heard from the primary recently (NULL otherwise).
+REPLICA_LAG_SQL = """
+    SELECT
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END AS lag_s,
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            ELSE (
+                SELECT EXTRACT(EPOCH FROM now() - last_msg_receipt_time)
+                FROM pg_stat_wal_receiver
+                WHERE status = 'streaming'
+            )
+        END AS receipt_age_s
+"""
+
+
+class Replica:
+    name: str
+    database: Database
+    lag_s: Optional[float]
+    healthy: bool
+    error: Optional[str]
+
+    def __init__(self, name: str, database: Database) -> None:
+        self.name = name
+        self.database = database
+        self.lag_s = None
+        self.healthy = False
+        self.error = None
+        DB_REPLICA_LAG.labels(name).set_function(lambda: self.lag_s or 0.0)
+        DB_REPLICA_HEALTHY.labels(name).set_function(lambda: float(self.healthy))
+
+
+class ReadRouter:
+    """Round-robins read-only queries across replicas whose replay lag is
+    within ``max_lag_s``, falling back to the primary when none are.
+
+    A replica whose WAL receiver is not streaming, or has received nothing
+    from the primary for ``max_receipt_age_s``, is skipped as well: its lag
+    cannot be measured. The primary sends a keepalive at least every half
+    ``wal_sender_timeout`` (30s by default) even when idle.
+    """
+
+    _primary: Database
+    _replicas: List[Replica]
+    _max_lag_s: float
+    _max_receipt_age_s: float
+    _check_interval_s: float
+    _acquire_timeout_s: Optional[float]
+    _next: int
+    _task: Optional["asyncio.Task[None]"]
+
+    def __init__(
+        self,
+        primary: Database,
+        replicas: Sequence[Database] = (),
+        *,
+        max_lag_s: float = 5.0,
+        max_receipt_age_s: float = 60.0,
+        check_interval_s: float = 1.0,
+        acquire_timeout_s: Optional[float] = None,
+    ) -> None:
+        self._primary = primary
+        self._replicas = [
+            Replica(f"replica{i}", database) for i, database in enumerate(replicas)
+        ]
+        self._max_lag_s = max_lag_s
+        self._max_receipt_age_s = max_receipt_age_s
+        self._check_interval_s = check_interval_s
+        self._acquire_timeout_s = acquire_timeout_s
+        self._next = 0
+        self._task = None
+
+    @property
+    def replicas(self) -> List[Replica]:
+        return self._replicas
+
+    def database(self) -> Database:
+        count = len(self._replicas)
+        for _ in range(count):
+            replica = self._replicas[self._next % count]
+            self._next = (self._next + 1) % count
+            if replica.healthy:
+                return replica.database
+        return self._primary
+
+    async def start(self) -> None:
+        if not self._replicas or self._task is not None:
+            return
+        # Checked once up front so the first requests already route by lag.
+        # Replicas that cannot be reached yet are retried on every check.
+        await self._check_all()
+        self._task = asyncio.create_task(self._monitor())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self._replicas:
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self._check_interval_s)
+            await self._check_all()
+
+    async def _check_all(self) -> None:
+        await asyncio.gather(*(self._check(replica) for replica in self._replicas))
+
+    async def _check(self, replica: Replica) -> None:
+        was_healthy = replica.healthy
+        try:
+            if not replica.database.is_connected:
+                await replica.database.connect()
+                instrument_pool(
+                    replica.database,
+                    name=replica.name,
+                    acquire_timeout_s=self._acquire_timeout_s,
+                )
+            row = await replica.database.fetch_one(REPLICA_LAG_SQL)
+            replica.lag_s = float(row["lag_s"])
+            streaming = (
+                row["receipt_age_s"] is not None
+                and float(row["receipt_age_s"]) <= self._max_receipt_age_s
+            )
+            replica.healthy = streaming and replica.lag_s <= self._max_lag_s
+            replica.error = None
+        except Exception as e:
+            replica.lag_s = None
+            replica.healthy = False
+            # Logged once per distinct failure rather than on every check.
+            if str(e) != replica.error:
+                logger.error(f"Read replica '{replica.name}' check failed: {e}")
+            replica.error = str(e)
+            return
+
+        if was_healthy and not replica.healthy:
+            if not streaming:
+                logger.warning(
+                    f"Read replica '{replica.name}' is not streaming from the "
+                    f"primary; routing around it"
+                )
+            else:
+                logger.warning(
+                    f"Read replica '{replica.name}' is {replica.lag_s:.1f}s behind; "
+                    f"routing around it"
+                )
+        elif replica.healthy and not was_healthy:
+            logger.info(f"Read replica '{replica.name}' is serving reads")
@@ -0,0 +1,57 @@
+import datetime
+from collections import Counter
+from typing import Any, Iterable, Tuple
+
+ROLLUP_SHARDS = 16
+
+# Raw statements so that the app's pooled connections and the seeder's
+# driver connection share one implementation. Inputs are pre-aggregated
+# and sorted: ON CONFLICT cannot touch a row twice in one statement, and a
+# fixed order keeps concurrent writers from deadlocking on row locks.
+BUMP_NAME_COUNTS = """
+    INSERT INTO submission_name_counts AS c (first_name, last_name, count)
+    SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::bigint[])
+    ON CONFLICT (first_name, last_name) DO UPDATE SET count = c.count + EXCLUDED.count
+"""
+
+BUMP_DATE_COUNTS = """
+    INSERT INTO submission_date_counts AS c (date, shard, count)
+    SELECT d, $2::smallint, n FROM unnest($1::date[], $3::bigint[]) AS u(d, n)
+    ON CONFLICT (date, shard) DO UPDATE SET count = c.count + EXCLUDED.count
+"""
+
+BUMP_TOTAL = """
+    INSERT INTO submission_totals AS c (shard, count) VALUES ($1, $2)
+    ON CONFLICT (shard) DO UPDATE SET count = c.count + EXCLUDED.count
+"""
+
+
+async def bump_rollups(
+    conn: Any,
+    rows: Iterable[Tuple[datetime.date, str, str]],
+    *,
+    shard_key: int,
+) -> None:
+    """Add ``(date, first_name, last_name)`` rows to the rollups inside the
+    caller's transaction. ``conn`` is an asyncpg connection (or proxy)."""
+    names: Counter = Counter()
+    dates: Counter = Counter()
+    for date, first_name, last_name in rows:
+        names[(first_name, last_name)] += 1
+        dates[date] += 1
+    if not names:
+        return
+
+    name_keys = sorted(names)
+    await conn.execute(
+        BUMP_NAME_COUNTS,
+        [first_name for first_name, _ in name_keys],
+        [last_name for _, last_name in name_keys],
+        [names[key] for key in name_keys],
+    )
+    date_keys = sorted(dates)
+    shard = shard_key % ROLLUP_SHARDS
+    await conn.execute(
+        BUMP_DATE_COUNTS, date_keys, shard, [dates[key] for key in date_keys]
+    )
+    await conn.execute(BUMP_TOTAL, shard, sum(names.values()))
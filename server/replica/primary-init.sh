@@ -0,0 +1,4 @@
+#!/bin/bash
+# Lets the replica in docker-compose.replica.yml stream WAL from the primary.
+set -e
+echo "host replication all all md5" >> "$PGDATA/pg_hba.conf"
@@ -1,12 +1,17 @@
+import base64
 import datetime
-from typing import List, Dict, Any
-from pydantic import BaseModel, field_validator
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field, field_validator
+
+# Width of the name columns, so an overlong name is rejected with the rest
+# of its record's validation instead of failing a whole batched insert.
+NAME_MAX_LENGTH = 100
 
 
 class SubmitPayload(BaseModel):
     date: datetime.date
-    first_name: str
-    last_name: str
+    first_name: str = Field(max_length=NAME_MAX_LENGTH)
+    last_name: str = Field(max_length=NAME_MAX_LENGTH)
 
     @field_validator("first_name")
     def no_whitespace_in_first(cls, v: str) -> str:
@@ -26,6 +31,19 @@ class ErrorResponse(BaseModel):
     error: Dict[str, List[str]]
 
 
+class BatchItemResult(BaseModel):
+    index: int
+    success: bool
+    id: Optional[int] = None
+    error: Optional[Dict[str, List[str]]] = None
+
+
+class BatchSubmitResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[BatchItemResult]
+
+
 class HistoryItem(BaseModel):
     date: str
     first_name: str
@@ -33,6 +51,37 @@ class HistoryItem(BaseModel):
     count: int
 
 
+class StatsResponse(BaseModel):
+    total: int
+    name_count: Optional[int] = None
+    date_count: Optional[int] = None
+    date_range_count: Optional[int] = None
+
+
+class SubmissionCountResponse(BaseModel):
+    first_name: str
+    last_name: str
+    before: Optional[datetime.date] = None
+    count: int
+    last_date: Optional[datetime.date] = None
+
+
+class HistoryCursor(BaseModel):
+    date: datetime.date
+    first_name: str
+    last_name: str
+    id: int
+
+    def encode(self) -> str:
+        raw = self.model_dump_json().encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "HistoryCursor":
+        padded = token + "=" * (-len(token) % 4)
+        return cls.model_validate_json(base64.urlsafe_b64decode(padded))
+
+
 class SuccessResponse(BaseModel):
     success: bool = True
     data: List[Dict[str, Any]]
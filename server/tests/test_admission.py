@@ -0,0 +1,265 @@
+import asyncio
+import itertools
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+import pytest
+
+from app.admission import (
+    AdaptiveLimit,
+    AdmissionControlMiddleware,
+    AdmissionRejected,
+    outside_admission_limit,
+)
+from db.querylog import add_db_time
+
+_names = itertools.count()
+
+
+def _limit(**options: Any) -> AdaptiveLimit:
+    # A fresh gauge label per limit, so tests do not share metric children.
+    defaults: Dict[str, Any] = dict(
+        initial_limit=1, max_limit=1, queue_size=1, queue_timeout_s=1.0
+    )
+    return AdaptiveLimit(f"test{next(_names)}", **{**defaults, **options})
+
+
+def _app(handler: Callable[[], Awaitable[None]]) -> Callable[..., Awaitable[None]]:
+    async def app(scope: Any, receive: Any, send: Any) -> None:
+        await handler()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain")],
+            }
+        )
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return app
+
+
+def _client(app: Any, limit: AdaptiveLimit) -> httpx.AsyncClient:
+    middleware = AdmissionControlMiddleware(app, [("/work", limit)])
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=middleware), base_url="http://test"
+    )
+
+
+def test_full_queue_is_rejected_with_429() -> None:
+    async def scenario() -> None:
+        limit = _limit(queue_size=0)
+        entered, done = asyncio.Event(), asyncio.Event()
+
+        async def handler() -> None:
+            entered.set()
+            await done.wait()
+
+        async with _client(_app(handler), limit) as client:
+            first = asyncio.create_task(client.get("/work"))
+            await entered.wait()
+            rejected = await client.get("/work")
+            done.set()
+            assert (await first).status_code == 200
+
+        assert rejected.status_code == 429
+        assert int(rejected.headers["Retry-After"]) >= 1
+        assert limit.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_is_rejected_with_503_and_retry_after() -> None:
+    async def scenario() -> None:
+        limit = _limit(queue_timeout_s=0.05)
+        entered, done = asyncio.Event(), asyncio.Event()
+
+        async def handler() -> None:
+            entered.set()
+            await done.wait()
+
+        async with _client(_app(handler), limit) as client:
+            first = asyncio.create_task(client.get("/work"))
+            await entered.wait()
+            timed_out = await client.get("/work")
+            done.set()
+            await first
+
+        assert timed_out.status_code == 503
+        assert timed_out.json() == {"detail": "Server overloaded"}
+        assert int(timed_out.headers["Retry-After"]) >= 1
+        assert limit.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_unlimited_and_exempt_paths_pass_through() -> None:
+    async def scenario() -> None:
+        limit = _limit(queue_size=0)
+        limit.in_flight = 1  # saturated
+        app = _app(lambda: asyncio.sleep(0))
+        middleware = AdmissionControlMiddleware(
+            app, [("/health", limit)], exempt=["/health/live"]
+        )
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            assert (await client.get("/health/live")).status_code == 200
+            assert (await client.get("/other")).status_code == 200
+            assert (await client.get("/health/ready")).status_code == 429
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_returns_a_handed_over_slot() -> None:
+    async def scenario() -> None:
+        limit = _limit(queue_size=2)
+        await limit.acquire()
+
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        assert limit.in_flight == 1 and waiter.done() is False
+
+        # release() hands the slot straight to the waiter (in_flight stays
+        # 1); the waiter is cancelled before it gets to run. Before 3.12,
+        # wait_for() returns the result instead of raising when the inner
+        # future is already done, in which case the waiter owns the slot.
+        limit.release(elapsed_s=0.01, db_s=None, overloaded=False)
+        assert limit.in_flight == 1
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            assert limit.in_flight == 0
+        else:
+            assert limit.in_flight == 1
+            limit.release(elapsed_s=0.01, db_s=None, overloaded=False)
+            assert limit.in_flight == 0
+
+        # The slot is usable again.
+        await asyncio.wait_for(limit.acquire(), 0.1)
+        assert limit.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue() -> None:
+    async def scenario() -> None:
+        limit = _limit(queue_size=1)
+        await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # Its queue place is free again, and the release is not handed to it.
+        queued = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        limit.release(elapsed_s=0.01, db_s=None, overloaded=False)
+        await asyncio.wait_for(queued, 0.1)
+        assert limit.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def _serve(limit: AdaptiveLimit, db_s: float, n: int) -> None:
+    # n requests, each with the limit saturated while it runs.
+    for _ in range(n):
+        limit.in_flight = int(limit.limit)
+        limit.release(elapsed_s=db_s, db_s=db_s, overloaded=False)
+
+
+def test_limit_shrinks_as_database_time_rises() -> None:
+    limit = _limit(initial_limit=50, max_limit=500, min_limit=4)
+    _serve(limit, 0.010, 200)
+    settled = limit.limit
+    assert settled >= 50
+
+    limits: List[float] = []
+    for db_s in (0.02, 0.04, 0.08, 0.16):
+        _serve(limit, db_s, 100)
+        limits.append(limit.limit)
+
+    assert limits == sorted(limits, reverse=True)
+    assert limits[-1] < settled / 2
+    assert limits[-1] >= 4
+
+
+def test_capacity_errors_back_off_and_other_failures_do_not() -> None:
+    limit = _limit(initial_limit=100, max_limit=100)
+    limit.in_flight = 1
+    limit.release(elapsed_s=0.01, db_s=None, overloaded=True)
+    assert limit.limit == pytest.approx(90)
+
+    limit.in_flight = 1
+    limit.release(elapsed_s=0.01, db_s=None, overloaded=False)
+    assert limit.limit == pytest.approx(90)
+
+
+def test_outside_admission_limit_frees_the_slot_while_waiting() -> None:
+    async def scenario() -> None:
+        limit = _limit(queue_size=1)
+        order: List[str] = []
+        waiting, resume = asyncio.Event(), asyncio.Event()
+
+        async def handler() -> None:
+            if not waiting.is_set():
+                async with outside_admission_limit():
+                    waiting.set()
+                    await resume.wait()
+                order.append("slow")
+            else:
+                # Database time is only counted while the slot is held.
+                add_db_time(0.01)
+                order.append("fast")
+
+        async with _client(_app(handler), limit) as client:
+            slow = asyncio.create_task(client.get("/work"))
+            await waiting.wait()
+            # Admitted at once although the slow request is still running.
+            fast = await asyncio.wait_for(client.get("/work"), 1)
+            resume.set()
+            assert (await slow).status_code == 200
+
+        assert fast.status_code == 200
+        assert order == ["fast", "slow"]
+        assert limit.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_rejection_when_queuing_again_after_outside_admission_limit() -> None:
+    async def scenario() -> None:
+        limit = _limit(queue_size=0)
+        waiting, resume, hold = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        entered = asyncio.Event()
+
+        async def handler() -> None:
+            if not waiting.is_set():
+                async with outside_admission_limit():
+                    waiting.set()
+                    await resume.wait()
+            else:
+                entered.set()
+                await hold.wait()
+
+        async with _client(_app(handler), limit) as client:
+            slow = asyncio.create_task(client.get("/work"))
+            await waiting.wait()
+            other = asyncio.create_task(client.get("/work"))
+            await entered.wait()
+            resume.set()
+            rejected = await slow
+            hold.set()
+            assert (await other).status_code == 200
+
+        assert rejected.status_code == 429
+        assert "Retry-After" in rejected.headers
+        assert limit.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_admission_rejected_carries_status_and_retry_after() -> None:
+    e = AdmissionRejected(503, "Server overloaded", 3)
+    assert (e.status_code, e.retry_after_s, str(e)) == (503, 3, "Server overloaded")
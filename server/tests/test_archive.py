@@ -0,0 +1,125 @@
+import datetime
+from typing import Any, List, Tuple
+
+import numpy as np
+
+from db.archive import MonthColumns, SubmissionArchive
+
+UTC = datetime.timezone.utc
+MAY = datetime.date(2025, 5, 1)
+JUNE = datetime.date(2025, 6, 1)
+
+Record = Tuple[int, datetime.date, str, str, datetime.datetime]
+
+
+def _records(month: datetime.date, names: List[Tuple[str, str]], start: int) -> List[Record]:
+    created_at = datetime.datetime(2025, 7, 1, 12, tzinfo=UTC)
+    return [
+        (start + i, month.replace(day=1 + i % 28), first, last, created_at)
+        for i, (first, last) in enumerate(names)
+    ]
+
+
+def _publish(archive: SubmissionArchive, month: datetime.date, *chunks: List[Record]) -> str:
+    columns = MonthColumns()
+    for chunk in chunks:
+        columns.add(chunk)
+    archive.write_pending(month, columns)
+    assert archive.pending() == [month]
+    return archive.publish(month)
+
+
+def test_month_columns_match_a_single_pass_encoding() -> None:
+    records = _records(MAY, [("Zed", "B"), ("Ann", "A"), ("Zed", "A"), ("Bo", "C")], 1)
+    columns = MonthColumns()
+    columns.add(records[:1])
+    columns.add([])
+    columns.add(records[1:])
+    data = columns.columns()
+
+    first_values, first_codes = np.unique(
+        np.array([r[2] for r in records]), return_inverse=True
+    )
+    assert columns.rows == 4
+    assert data["first_name_values"].tolist() == first_values.tolist()
+    assert data["first_name_codes"].tolist() == first_codes.tolist()
+    assert data["last_name_values"].tolist() == ["A", "B", "C"]
+    assert data["last_name_codes"].tolist() == [1, 0, 0, 2]
+    assert data["id"].tolist() == [1, 2, 3, 4]
+    assert data["created_at"].tolist() == [datetime.datetime(2025, 7, 1, 12)] * 4
+
+
+def test_empty_month_columns() -> None:
+    data = MonthColumns().columns()
+    assert {name: len(values) for name, values in data.items()} == dict.fromkeys(data, 0)
+
+
+def test_pending_files_are_not_read_until_published(tmp_path: Any) -> None:
+    archive = SubmissionArchive(str(tmp_path))
+    columns = MonthColumns()
+    columns.add(_records(MAY, [("Ann", "Lee")], 1))
+    archive.write_pending(MAY, columns)
+
+    assert archive.months() == []
+    assert archive.count("Ann", "Lee") == (0, None)
+    assert archive.publish(MAY) == "submissions_2025_05.0.npz"
+    assert archive.pending() == []
+    assert archive.count("Ann", "Lee") == (1, MAY)
+
+
+def test_late_rows_become_a_new_part(tmp_path: Any) -> None:
+    archive = SubmissionArchive(str(tmp_path))
+    _publish(archive, MAY, _records(MAY, [("Ann", "Lee")] * 3, 10))
+    assert _publish(archive, MAY, _records(MAY, [("Ann", "Lee")], 1)) == (
+        "submissions_2025_05.1.npz"
+    )
+    _publish(archive, JUNE, _records(JUNE, [("Ann", "Lee"), ("Bo", "Lee")], 20))
+
+    assert archive.months() == [MAY, JUNE]
+    assert archive.months_between(datetime.date(2025, 5, 20), None) == [MAY, JUNE]
+    assert archive.months_between(None, datetime.date(2025, 5, 31)) == [MAY]
+    assert archive.count("Ann", "Lee") == (5, JUNE)
+    assert archive.count("Ann", "Lee", before=datetime.date(2025, 5, 3)) == (
+        3,
+        datetime.date(2025, 5, 2),
+    )
+    assert archive.count("Cy", "Lee") == (0, None)
+
+    ids = [row[0] for chunk in archive.rows(MAY, chunk_rows=2) for row in chunk]
+    # Part by part, each in id order.
+    assert ids == [10, 11, 12, 1]
+
+
+def test_rows_are_filtered_and_chunked(tmp_path: Any) -> None:
+    archive = SubmissionArchive(str(tmp_path))
+    names = [("Ann", "Lee"), ("Bo", "Lee"), ("Ann", "Lee"), ("Ann", "Kim"), ("Ann", "Lee")]
+    _publish(archive, MAY, _records(MAY, names, 1))
+
+    chunks = list(
+        archive.rows(
+            MAY,
+            chunk_rows=2,
+            first_name="Ann",
+            last_name="Lee",
+            date_from=datetime.date(2025, 5, 2),
+        )
+    )
+
+    assert chunks == [
+        [
+            (3, datetime.date(2025, 5, 3), "Ann", "Lee"),
+            (5, datetime.date(2025, 5, 5), "Ann", "Lee"),
+        ]
+    ]
+    assert list(archive.rows(JUNE, chunk_rows=2)) == []
+
+
+def test_decoded_parts_are_cached_up_to_cache_months(tmp_path: Any) -> None:
+    archive = SubmissionArchive(str(tmp_path), cache_months=1)
+    may = _publish(archive, MAY, _records(MAY, [("Ann", "Lee")], 1))
+    june = _publish(archive, JUNE, _records(JUNE, [("Ann", "Lee")], 2))
+
+    assert archive.load(may) is archive.load(may)
+    first = archive.load(may)
+    archive.load(june)
+    assert archive.load(may) is not first
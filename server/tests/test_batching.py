@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+from typing import Any, Dict, List
+
+import pytest
+
+from db import batching
+from db.batching import SubmissionBatcher, SubmissionQueueFull
+from db.querylog import DbTime, add_db_time, current_db_time, mark_db_overloaded
+
+
+class FakeInsert:
+    """Stands in for ``insert_submissions``: records each batch and hands out
+    consecutive ids, spending ``seconds`` of database time per flush."""
+
+    def __init__(self, seconds: float = 0.0, overloaded: bool = False) -> None:
+        self.batches: List[List[Dict[str, Any]]] = []
+        self.seconds = seconds
+        self.overloaded = overloaded
+        self.error: Exception = None  # type: ignore[assignment]
+
+    async def __call__(self, db: Any, records: List[Dict[str, Any]]) -> List[int]:
+        self.batches.append(records)
+        add_db_time(self.seconds)
+        if self.overloaded:
+            mark_db_overloaded()
+        if self.error is not None:
+            raise self.error
+        start = sum(len(batch) for batch in self.batches[:-1])
+        return list(range(start + 1, start + 1 + len(records)))
+
+
+@pytest.fixture
+def fake_insert(monkeypatch: pytest.MonkeyPatch) -> FakeInsert:
+    fake = FakeInsert()
+    monkeypatch.setattr(batching, "insert_submissions", fake)
+    return fake
+
+
+def _batcher(**options: Any) -> SubmissionBatcher:
+    return SubmissionBatcher(None, **options)  # type: ignore[arg-type]
+
+
+async def _submit(batcher: SubmissionBatcher, n: int) -> int:
+    return await batcher.submit(
+        date=datetime.date(2025, 5, 1), first_name=f"First{n}", last_name="Last"
+    )
+
+
+def test_flush_time_is_credited_to_each_submitter(fake_insert: FakeInsert) -> None:
+    fake_insert.seconds = 0.25
+    fake_insert.overloaded = True
+
+    async def request(batcher: SubmissionBatcher, n: int) -> DbTime:
+        # What AdmissionControlMiddleware sets up for an admitted request.
+        db_time = DbTime()
+        current_db_time.set(db_time)
+        await _submit(batcher, n)
+        return db_time
+
+    async def scenario() -> List[DbTime]:
+        batcher = _batcher(max_size=3, max_delay_s=1.0)
+        await batcher.start()
+        try:
+            return await asyncio.gather(*(request(batcher, n) for n in range(3)))
+        finally:
+            await batcher.stop()
+
+    db_times = asyncio.run(scenario())
+
+    assert len(fake_insert.batches) == 1
+    assert [db_time.seconds for db_time in db_times] == [0.25] * 3
+    assert all(db_time.overloaded for db_time in db_times)
+
+
+def test_flush_time_is_not_credited_to_the_batcher_task(
+    fake_insert: FakeInsert,
+) -> None:
+    fake_insert.seconds = 0.25
+
+    async def scenario() -> DbTime:
+        outer = DbTime()
+        current_db_time.set(outer)
+        # The worker task copies this context when it is started.
+        batcher = _batcher(max_size=1)
+        await batcher.start()
+        try:
+            current_db_time.set(None)
+            await _submit(batcher, 1)
+        finally:
+            await batcher.stop()
+        return outer
+
+    assert asyncio.run(scenario()).seconds == 0.0
+
+
+def test_concurrent_submissions_share_a_flush(fake_insert: FakeInsert) -> None:
+    async def scenario() -> List[int]:
+        batcher = _batcher(max_size=4, max_delay_s=0.05)
+        await batcher.start()
+        try:
+            return await asyncio.gather(*(_submit(batcher, n) for n in range(10)))
+        finally:
+            await batcher.stop()
+
+    ids = asyncio.run(scenario())
+
+    assert [len(batch) for batch in fake_insert.batches] == [4, 4, 2]
+    # Each submitter gets the id of its own record.
+    names = [record["first_name"] for batch in fake_insert.batches for record in batch]
+    assert [names[row_id - 1] for row_id in ids] == [f"First{n}" for n in range(10)]
+
+
+def test_a_lone_submission_is_flushed_after_max_delay(fake_insert: FakeInsert) -> None:
+    async def scenario() -> None:
+        batcher = _batcher(max_size=100, max_delay_s=0.01)
+        await batcher.start()
+        try:
+            assert await asyncio.wait_for(_submit(batcher, 1), 1) == 1
+        finally:
+            await batcher.stop()
+
+    asyncio.run(scenario())
+    assert len(fake_insert.batches) == 1
+
+
+def test_a_failed_flush_fails_every_submitter(fake_insert: FakeInsert) -> None:
+    fake_insert.error = RuntimeError("insert failed")
+
+    async def scenario() -> List[Any]:
+        batcher = _batcher(max_size=3, max_delay_s=1.0)
+        await batcher.start()
+        try:
+            return await asyncio.gather(
+                *(_submit(batcher, n) for n in range(3)), return_exceptions=True
+            )
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(scenario())
+    assert [str(result) for result in results] == ["insert failed"] * 3
+
+
+def test_a_full_queue_rejects_and_marks_the_request_overloaded(
+    fake_insert: FakeInsert,
+) -> None:
+    async def scenario() -> DbTime:
+        batcher = _batcher(
+            queue_size=1, max_size=10, max_delay_s=1.0, enqueue_timeout_s=0.01
+        )
+        await batcher.start()
+        first = asyncio.create_task(_submit(batcher, 1))
+        await asyncio.sleep(0)
+        db_time = DbTime()
+        current_db_time.set(db_time)
+        with pytest.raises(SubmissionQueueFull):
+            await _submit(batcher, 2)
+        await batcher.stop()
+        assert await first == 1
+        return db_time
+
+    assert asyncio.run(scenario()).overloaded
+
+
+def test_stop_drains_accepted_submissions_and_refuses_new_ones(
+    fake_insert: FakeInsert,
+) -> None:
+    async def scenario() -> None:
+        batcher = _batcher(max_size=100, max_delay_s=10.0)
+        await batcher.start()
+        pending = [asyncio.create_task(_submit(batcher, n)) for n in range(3)]
+        # Let them through the enqueue; the flush is still 10s away.
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        assert [task.result() for task in pending] == [1, 2, 3]
+        with pytest.raises(SubmissionQueueFull):
+            await _submit(batcher, 4)
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in fake_insert.batches] == [3]
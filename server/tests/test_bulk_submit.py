@@ -0,0 +1,128 @@
+import json
+import asyncio
+import datetime
+from typing import Any, Iterable, List, Tuple
+
+import httpx
+import pytest
+
+# app.main first: it imports the views at the end of its setup.
+from app.main import app
+from app import views
+from schemas.submission import NAME_MAX_LENGTH
+
+Record = Tuple[datetime.date, str, str]
+
+
+class FakeCopy:
+    """Stands in for ``copy_submissions``: records the rows it is given and
+    hands out consecutive ids."""
+
+    def __init__(self) -> None:
+        self.records: List[Record] = []
+
+    async def __call__(self, db: Any, records: List[Record]) -> List[int]:
+        start = len(self.records)
+        self.records.extend(records)
+        return list(range(start + 1, start + 1 + len(records)))
+
+
+@pytest.fixture
+def fake_copy(monkeypatch: pytest.MonkeyPatch) -> FakeCopy:
+    fake = FakeCopy()
+    monkeypatch.setattr(views, "copy_submissions", fake)
+    return fake
+
+
+def _post(content: Any, content_type: str) -> httpx.Response:
+    async def request() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/submit/batch", content=content, headers={"content-type": content_type}
+            )
+
+    return asyncio.run(request())
+
+
+def _chunked(lines: Iterable[str], size: int) -> Any:
+    # Chunk boundaries that fall inside records, as a client may send them.
+    body = "".join(lines).encode()
+
+    async def chunks() -> Any:
+        for i in range(0, len(body), size):
+            yield body[i : i + size]
+
+    return chunks()
+
+
+VALID = {"date": "2025-05-01", "first_name": "Ann", "last_name": "Lee"}
+
+
+def test_ndjson_records_across_chunk_boundaries(fake_copy: FakeCopy) -> None:
+    lines = [
+        json.dumps(VALID) + "\n",
+        "\n",
+        json.dumps({**VALID, "first_name": "Bo"}) + "\r\n",
+        json.dumps({**VALID, "first_name": "Cy"}),  # no trailing newline
+    ]
+    response = _post(_chunked(lines, 7), "application/x-ndjson")
+
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 3
+    assert [record[1] for record in fake_copy.records] == ["Ann", "Bo", "Cy"]
+    assert fake_copy.records[0][0] == datetime.date(2025, 5, 1)
+
+
+def test_invalid_records_are_reported_by_index(fake_copy: FakeCopy) -> None:
+    lines = [
+        json.dumps({**VALID, "first_name": "A B"}) + "\n",
+        json.dumps(VALID) + "\n",
+        "{not json\n",
+        json.dumps({**VALID, "last_name": "x" * (NAME_MAX_LENGTH + 1)}) + "\n",
+        json.dumps({"date": "2025-05-01", "first_name": "Bo"}) + "\n",
+    ]
+    response = _post(_chunked(lines, 64), "application/x-ndjson; charset=utf-8")
+
+    body = response.json()
+    assert response.status_code == 200
+    assert (body["accepted"], body["rejected"]) == (1, 4)
+    results = body["results"]
+    assert [r["success"] for r in results] == [False, True, False, False, False]
+    assert results[1]["id"] == 1
+    assert list(results[0]["error"]) == ["first_name"]
+    assert "first_name" not in results[2]["error"]
+    assert list(results[3]["error"]) == ["last_name"]
+    assert list(results[4]["error"]) == ["last_name"]
+
+
+def test_json_array_body(fake_copy: FakeCopy) -> None:
+    response = _post(
+        json.dumps([VALID, {**VALID, "date": "not a date"}]), "application/json"
+    )
+
+    body = response.json()
+    assert (body["accepted"], body["rejected"]) == (1, 1)
+    assert list(body["results"][1]["error"]) == ["date"]
+
+
+@pytest.mark.parametrize(
+    "content, detail",
+    [("{", "Body is not valid JSON"), ("{}", "Body must be a JSON array")],
+)
+def test_malformed_json_array_is_rejected(
+    fake_copy: FakeCopy, content: str, detail: str
+) -> None:
+    response = _post(content, "application/json")
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert fake_copy.records == []
+
+
+def test_too_many_records_is_rejected(
+    fake_copy: FakeCopy, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(views, "BULK_SUBMIT_MAX_RECORDS", 2)
+    response = _post((json.dumps(VALID) + "\n") * 3, "application/x-ndjson")
+    assert response.status_code == 413
+    assert fake_copy.records == []
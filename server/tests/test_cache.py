@@ -0,0 +1,177 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, List
+
+import pytest
+
+from db import cache
+from db.cache import CacheInvalidationListener, NameCountCache, QueryCache, origin
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _loader(calls: List[Any], value: Any) -> Callable[[], Any]:
+    async def load() -> Any:
+        calls.append(value)
+        return value
+
+    return load
+
+
+def test_query_cache_hits_until_the_entry_expires(clock: List[float]) -> None:
+    async def scenario() -> None:
+        query_cache = QueryCache("test", ttl_s=5.0)
+        calls: List[Any] = []
+        assert await query_cache.get_or_load("k", _loader(calls, 1)) == 1
+        clock[0] += 4.9
+        assert await query_cache.get_or_load("k", _loader(calls, 2)) == 1
+        clock[0] += 0.2
+        assert await query_cache.get_or_load("k", _loader(calls, 3)) == 3
+        assert calls == [1, 3]
+        assert (query_cache.hits, query_cache.misses) == (1, 2)
+
+    asyncio.run(scenario())
+
+
+def test_query_cache_evicts_least_recently_used(clock: List[float]) -> None:
+    async def scenario() -> None:
+        query_cache = QueryCache("test", maxsize=2)
+        calls: List[Any] = []
+        for key in ("a", "b", "a", "c"):
+            await query_cache.get_or_load(key, _loader(calls, key))
+        # "a" was used after "b", so "b" is the one evicted for "c".
+        await query_cache.get_or_load("a", _loader(calls, "a2"))
+        await query_cache.get_or_load("b", _loader(calls, "b2"))
+        assert calls == ["a", "b", "c", "b2"]
+
+    asyncio.run(scenario())
+
+
+def test_query_cache_coalesces_concurrent_loads() -> None:
+    async def scenario() -> None:
+        query_cache = QueryCache("test")
+        release = asyncio.Event()
+        calls: List[int] = []
+
+        async def load() -> str:
+            calls.append(1)
+            await release.wait()
+            return "value"
+
+        waiters = [
+            asyncio.create_task(query_cache.get_or_load("k", load)) for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        # A cancelled caller does not cancel the shared load.
+        waiters[0].cancel()
+        release.set()
+        results = await asyncio.gather(*waiters[1:])
+        assert results == ["value"] * 4
+        assert calls == [1]
+
+    asyncio.run(scenario())
+
+
+def test_query_cache_does_not_store_a_failed_load() -> None:
+    async def scenario() -> None:
+        query_cache = QueryCache("test")
+
+        async def fail() -> None:
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await query_cache.get_or_load("k", fail)
+        calls: List[Any] = []
+        assert await query_cache.get_or_load("k", _loader(calls, 1)) == 1
+
+    asyncio.run(scenario())
+
+
+def test_query_cache_drops_loads_that_straddle_an_invalidation() -> None:
+    async def scenario() -> None:
+        query_cache = QueryCache("test")
+        release = asyncio.Event()
+
+        async def stale() -> str:
+            await release.wait()
+            return "stale"
+
+        first = asyncio.create_task(query_cache.get_or_load("k", stale))
+        await asyncio.sleep(0)
+        query_cache.invalidate()
+        calls: List[Any] = []
+        # A caller after the invalidation starts its own load.
+        assert await query_cache.get_or_load("k", _loader(calls, "fresh")) == "fresh"
+        release.set()
+        assert await first == "stale"
+        # The stale result did not replace the fresh one.
+        assert await query_cache.get_or_load("k", _loader(calls, "other")) == "fresh"
+        assert calls == ["fresh"]
+
+    asyncio.run(scenario())
+
+
+KEY = ("Ann", "Lee")
+DAY = datetime.date(2025, 5, 1)
+
+
+def test_name_count_cache_applies_own_inserts_in_place() -> None:
+    counts = NameCountCache("test")
+    counts.put(KEY, (2, DAY), counts.generation)
+    counts.record_insert(KEY, DAY + datetime.timedelta(days=3), n=2)
+    counts.record_insert(KEY, DAY)
+    assert counts.get(KEY) == (5, DAY + datetime.timedelta(days=3))
+
+
+def test_name_count_cache_skips_loads_that_overlap_a_write() -> None:
+    counts = NameCountCache("test")
+    counts.begin_writes([KEY, KEY])
+    counts.put(KEY, (1, DAY), counts.generation)
+    assert counts.get(KEY) is None
+
+    # Still being written by the second of two overlapping inserts.
+    counts.end_writes([KEY])
+    counts.put(KEY, (1, DAY), counts.generation)
+    assert counts.get(KEY) is None
+
+    counts.end_writes([KEY])
+    counts.put(KEY, (2, DAY), counts.generation)
+    assert counts.get(KEY) == (2, DAY)
+
+
+def test_name_count_cache_skips_loads_started_before_a_write() -> None:
+    counts = NameCountCache("test")
+    generation = counts.generation
+    counts.begin_writes([KEY])
+    counts.end_writes([KEY])
+    counts.put(KEY, (1, DAY), generation)
+    assert counts.get(KEY) is None
+
+
+def test_name_count_cache_is_a_bounded_lru() -> None:
+    counts = NameCountCache("test", maxsize=2)
+    for i, key in enumerate([("a", "a"), ("b", "b"), ("c", "c")]):
+        counts.get(("a", "a"))
+        counts.put(key, (i, DAY), counts.generation)
+    assert counts.get(("a", "a")) == (0, DAY)
+    assert counts.get(("b", "b")) is None
+    assert counts.get(("c", "c")) == (2, DAY)
+
+
+def test_listener_keeps_write_through_caches_on_own_notifications() -> None:
+    query_cache = QueryCache("test")
+    counts = NameCountCache("test")
+    listener = CacheInvalidationListener("channel", query_cache, write_through=(counts,))
+    counts.put(KEY, (1, DAY), counts.generation)
+
+    listener._on_notify(None, 0, "channel", origin())
+    assert counts.get(KEY) == (1, DAY)
+
+    listener._on_notify(None, 0, "channel", "another-worker")
+    assert counts.get(KEY) is None
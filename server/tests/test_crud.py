@@ -0,0 +1,188 @@
+"""The three insert paths keep ``submission_counts`` and the rollups that
+``get_stats`` and ``get_submission_count`` read consistent with the rows
+written.
+
+Runs against the Postgres in ``DATABASE_URL`` (migrated, e.g. by starting
+the app once) and is skipped without it. Every test runs in a transaction
+that is rolled back, and uses names of its own, so existing rows do not
+matter.
+"""
+
+import os
+import uuid
+import asyncio
+import datetime
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import pytest
+from databases import Database
+from sqlalchemy import select
+
+from db.crud import (
+    copy_submissions,
+    get_stats,
+    get_submission_count,
+    history_cache,
+    insert_submission,
+    insert_submissions,
+    name_count_cache,
+)
+from db.models import submission_counts
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+
+DAY = datetime.date.today()
+YESTERDAY = DAY - datetime.timedelta(days=1)
+
+Record = Tuple[datetime.date, str, str]
+
+
+def _run(scenario: Callable[[Database], Awaitable[None]]) -> None:
+    async def main() -> None:
+        db = Database(DATABASE_URL, force_rollback=True)
+        await db.connect()
+        try:
+            await scenario(db)
+        finally:
+            await db.disconnect()
+            history_cache.invalidate()
+            name_count_cache.invalidate()
+
+    asyncio.run(main())
+
+
+def _name() -> Tuple[str, str]:
+    return "Test", uuid.uuid4().hex
+
+
+async def _insert_one_by_one(db: Database, records: List[Record]) -> List[int]:
+    return [
+        await insert_submission(
+            db, date=date, first_name=first_name, last_name=last_name
+        )
+        for date, first_name, last_name in records
+    ]
+
+
+async def _insert_batched(db: Database, records: List[Record]) -> List[int]:
+    return await insert_submissions(
+        db,
+        [
+            {"date": date, "first_name": first_name, "last_name": last_name}
+            for date, first_name, last_name in records
+        ],
+    )
+
+
+INSERT_PATHS = {
+    "insert_submission": _insert_one_by_one,
+    "insert_submissions": _insert_batched,
+    "copy_submissions": copy_submissions,
+}
+
+
+async def _day_counts(
+    db: Database, first_name: str, last_name: str
+) -> Dict[datetime.date, Tuple[int, int]]:
+    rows = await db.fetch_all(
+        select(
+            submission_counts.c.date,
+            submission_counts.c.day_count,
+            submission_counts.c.prior_count,
+        ).where(
+            submission_counts.c.first_name == first_name,
+            submission_counts.c.last_name == last_name,
+        )
+    )
+    return {row["date"]: (row["day_count"], row["prior_count"]) for row in rows}
+
+
+@pytest.mark.parametrize("path", INSERT_PATHS)
+def test_insert_paths_maintain_counts_and_rollups(path: str) -> None:
+    async def scenario(db: Database) -> None:
+        first_name, last_name = _name()
+        other = _name()
+        before = await get_stats(db, date=DAY, date_from=YESTERDAY, date_to=DAY)
+
+        # Out of date order, so prior_count of a later day must be raised.
+        records = [
+            (DAY, first_name, last_name),
+            (YESTERDAY, first_name, last_name),
+            (DAY, *other),
+            (DAY, first_name, last_name),
+        ]
+        ids = await INSERT_PATHS[path](db, records)
+
+        assert len(set(ids)) == 4
+        assert await _day_counts(db, first_name, last_name) == {
+            YESTERDAY: (1, 0),
+            DAY: (2, 1),
+        }
+
+        after = await get_stats(
+            db,
+            first_name=first_name,
+            last_name=last_name,
+            date=DAY,
+            date_from=YESTERDAY,
+            date_to=DAY,
+        )
+        assert after["total"] - before["total"] == 4
+        assert after["name_count"] == 3
+        assert after["date_count"] - before["date_count"] == 3
+        assert after["date_range_count"] - before["date_range_count"] == 4
+
+        count = await get_submission_count(
+            db, first_name=first_name, last_name=last_name
+        )
+        assert (count["count"], count["last_date"]) == (3, DAY)
+        before_today = await get_submission_count(
+            db, first_name=first_name, last_name=last_name, before=DAY
+        )
+        assert (before_today["count"], before_today["last_date"]) == (1, YESTERDAY)
+
+    _run(scenario)
+
+
+def test_cached_count_follows_own_inserts() -> None:
+    async def scenario(db: Database) -> None:
+        first_name, last_name = _name()
+        await insert_submission(
+            db, date=YESTERDAY, first_name=first_name, last_name=last_name
+        )
+        first = await get_submission_count(
+            db, first_name=first_name, last_name=last_name
+        )
+        assert name_count_cache.get((first_name, last_name)) == (1, YESTERDAY)
+
+        await copy_submissions(db, [(DAY, first_name, last_name)] * 2)
+        second = await get_submission_count(
+            db, first_name=first_name, last_name=last_name
+        )
+
+        assert (first["count"], second["count"]) == (1, 3)
+        assert second["last_date"] == DAY
+        # Served from the cache, updated in place; it matches a fresh count.
+        assert name_count_cache.get((first_name, last_name)) == (3, DAY)
+        name_count_cache.invalidate()
+        fresh = await get_submission_count(
+            db, first_name=first_name, last_name=last_name
+        )
+        assert (fresh["count"], fresh["last_date"]) == (3, DAY)
+
+    _run(scenario)
+
+
+def test_stats_for_an_unknown_name() -> None:
+    async def scenario(db: Database) -> None:
+        first_name, last_name = _name()
+        stats = await get_stats(db, first_name=first_name, last_name=last_name)
+        assert stats["name_count"] == 0
+        count = await get_submission_count(
+            db, first_name=first_name, last_name=last_name
+        )
+        assert (count["count"], count["last_date"]) == (0, None)
+
+    _run(scenario)
@@ -0,0 +1,302 @@
+"""``SubmissionExport`` streaming: CSV and NDJSON output, archived months
+first, and the connection handed back when a client stops reading.
+
+The unit tests run against an in-memory asyncpg stand-in. The tests at the
+end need ``DATABASE_URL`` and are skipped without it.
+"""
+
+import os
+import csv
+import io
+import json
+import asyncio
+import datetime
+from types import SimpleNamespace
+from typing import Any, List, Optional, Tuple
+
+import pytest
+from databases import Database
+
+from db.archive import MonthColumns, SubmissionArchive
+from db.export import EXPORT_COPY_BUFFER, SubmissionExport
+from db.pool import acquire_connection, release_connection
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+Row = Tuple[int, datetime.date, str, str]
+
+
+class FakeTransaction:
+    def __init__(self, conn: "FakeConnection") -> None:
+        self._conn = conn
+
+    async def start(self) -> None:
+        self._conn.log.append("begin")
+
+    async def rollback(self) -> None:
+        if self._conn.fail_rollback:
+            raise RuntimeError("connection is busy")
+        self._conn.log.append("rollback")
+
+
+class FakeCursor:
+    def __init__(self, rows: List[Row]) -> None:
+        self._rows = rows
+
+    async def fetch(self, n: int) -> List[Row]:
+        chunk, self._rows = self._rows[:n], self._rows[n:]
+        return chunk
+
+
+class FakeConnection:
+    """The part of ``asyncpg.Connection`` the export uses. COPY sends one
+    chunk per row, as a server would for large rows."""
+
+    def __init__(self, rows: List[Row]) -> None:
+        self.rows = rows
+        self.log: List[str] = []
+        self.fail_rollback = False
+        self.copy_cancelled = False
+        self.terminated = False
+
+    def transaction(self, **options: Any) -> FakeTransaction:
+        assert options == {"isolation": "repeatable_read", "readonly": True}
+        return FakeTransaction(self)
+
+    async def execute(self, sql: str, *args: Any) -> str:
+        self.log.append(sql)
+        return "SET"
+
+    async def cursor(self, sql: str, *args: Any) -> FakeCursor:
+        return FakeCursor(list(self.rows))
+
+    async def copy_from_query(
+        self, sql: str, *args: Any, output: Any, format: str
+    ) -> str:
+        assert format == "csv"
+        try:
+            for row in self.rows:
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator="\n").writerow(row)
+                await output(buffer.getvalue().encode())
+        except asyncio.CancelledError:
+            self.copy_cancelled = True
+            raise
+        return f"COPY {len(self.rows)}"
+
+    def terminate(self) -> None:
+        self.terminated = True
+
+
+class FakePool:
+    def __init__(self, conn: FakeConnection) -> None:
+        self._conn = conn
+        self.in_use = 0
+
+    async def acquire(self) -> FakeConnection:
+        self.in_use += 1
+        return self._conn
+
+    async def release(self, conn: FakeConnection) -> None:
+        assert conn is self._conn
+        self.in_use -= 1
+
+
+def _database(pool: FakePool) -> Any:
+    # What acquire_connection() looks up on a connected ``databases`` object.
+    return SimpleNamespace(_backend=SimpleNamespace(_pool=pool))
+
+
+def _rows(n: int, start: int = 1) -> List[Row]:
+    return [
+        (i, datetime.date(2025, 5, 1 + i % 28), f"First{i}", f"Last{i}")
+        for i in range(start, start + n)
+    ]
+
+
+def _archive(tmp_path: Any, rows: List[Row]) -> SubmissionArchive:
+    archive = SubmissionArchive(str(tmp_path))
+    if rows:
+        columns = MonthColumns()
+        created_at = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        columns.add([(*row, created_at) for row in rows])
+        month = rows[0][1].replace(day=1)
+        archive.write_pending(month, columns)
+        archive.publish(month)
+    return archive
+
+
+async def _collect(export: SubmissionExport, chunks: Optional[int] = None) -> bytes:
+    """The body, or its first ``chunks`` chunks followed by a disconnect."""
+    await export.open()
+    stream = export.stream()
+    body = b""
+    async for chunk in stream:
+        body += chunk
+        if chunks is not None:
+            chunks -= 1
+            if chunks == 0:
+                break
+    await stream.aclose()
+    await export.close()
+    return body
+
+
+def test_ndjson_streams_archive_then_table(tmp_path: Any) -> None:
+    archived = [
+        (i, datetime.date(2024, 3, 1 + i), "Ann", "Old") for i in range(3)
+    ]
+    conn = FakeConnection(_rows(7, start=100))
+    pool = FakePool(conn)
+    export = SubmissionExport(
+        _database(pool),
+        format="ndjson",
+        fetch_rows=3,
+        archive=_archive(tmp_path, archived),
+    )
+
+    body = asyncio.run(_collect(export))
+
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert [line["id"] for line in lines] == [0, 1, 2, *range(100, 107)]
+    assert lines[0] == {
+        "id": 0, "date": "2024-03-01", "first_name": "Ann", "last_name": "Old"
+    }
+    assert export.rows == 10
+    assert conn.log == ["begin", "SET LOCAL statement_timeout = 0", "rollback"]
+    assert pool.in_use == 0
+
+
+def test_csv_streams_header_archive_then_copy(tmp_path: Any) -> None:
+    archived = [(1, datetime.date(2024, 3, 2), 'Quote "Q"', "Comma, Jr")]
+    conn = FakeConnection(_rows(4, start=10))
+    pool = FakePool(conn)
+    export = SubmissionExport(
+        _database(pool), format="csv", archive=_archive(tmp_path, archived)
+    )
+
+    body = asyncio.run(_collect(export))
+
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert rows[0] == ["id", "date", "first_name", "last_name"]
+    assert rows[1] == ["1", "2024-03-02", 'Quote "Q"', "Comma, Jr"]
+    assert [int(row[0]) for row in rows[2:]] == [10, 11, 12, 13]
+    assert export.rows == 5
+    assert pool.in_use == 0
+
+
+def test_csv_client_disconnect_stops_copy_and_releases(tmp_path: Any) -> None:
+    # More rows than the COPY buffer holds, so COPY is blocked on the client
+    # when it goes away.
+    conn = FakeConnection(_rows(EXPORT_COPY_BUFFER * 4))
+    pool = FakePool(conn)
+    export = SubmissionExport(
+        _database(pool), format="csv", archive=_archive(tmp_path, [])
+    )
+
+    body = asyncio.run(_collect(export, chunks=3))
+
+    assert body.startswith(b"id,date,first_name,last_name\n")
+    assert conn.copy_cancelled
+    assert conn.log[-1] == "rollback"
+    assert pool.in_use == 0
+
+
+def test_ndjson_client_disconnect_releases(tmp_path: Any) -> None:
+    conn = FakeConnection(_rows(50))
+    pool = FakePool(conn)
+    export = SubmissionExport(
+        _database(pool), format="ndjson", fetch_rows=10, archive=_archive(tmp_path, [])
+    )
+
+    body = asyncio.run(_collect(export, chunks=1))
+
+    assert len(body.decode().splitlines()) == 10
+    assert export.rows == 10
+    assert pool.in_use == 0
+
+
+def test_unusable_connection_is_terminated_before_release(tmp_path: Any) -> None:
+    conn = FakeConnection(_rows(5))
+    conn.fail_rollback = True
+    pool = FakePool(conn)
+    export = SubmissionExport(
+        _database(pool), format="ndjson", archive=_archive(tmp_path, [])
+    )
+
+    asyncio.run(_collect(export, chunks=1))
+
+    assert conn.terminated
+    assert pool.in_use == 0
+
+
+def test_close_is_idempotent_and_safe_before_open(tmp_path: Any) -> None:
+    pool = FakePool(FakeConnection([]))
+    export = SubmissionExport(
+        _database(pool), format="csv", archive=_archive(tmp_path, [])
+    )
+
+    async def scenario() -> None:
+        await export.close()
+        await export.open()
+        assert pool.in_use == 1
+        await export.close()
+        await export.close()
+
+    asyncio.run(scenario())
+    assert pool.in_use == 0
+
+
+@pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+def test_csv_and_ndjson_agree_against_postgres(tmp_path: Any) -> None:
+    async def scenario() -> None:
+        db = Database(DATABASE_URL, min_size=1, max_size=2)
+        await db.connect()
+        try:
+            day = datetime.date.today()
+            outputs = {}
+            for format in ("csv", "ndjson"):
+                export = SubmissionExport(
+                    db,
+                    format=format,
+                    date_from=day,
+                    date_to=day,
+                    fetch_rows=100,
+                    archive=_archive(tmp_path, []),
+                )
+                outputs[format] = (await _collect(export), export.rows)
+
+            csv_rows = list(csv.reader(io.StringIO(outputs["csv"][0].decode())))[1:]
+            ndjson_rows = [
+                json.loads(line) for line in outputs["ndjson"][0].decode().splitlines()
+            ]
+            assert outputs["csv"][1] == outputs["ndjson"][1] == len(ndjson_rows)
+            assert csv_rows == [
+                [str(r["id"]), r["date"], r["first_name"], r["last_name"]]
+                for r in ndjson_rows
+            ]
+        finally:
+            await db.disconnect()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+def test_disconnect_returns_connection_against_postgres(tmp_path: Any) -> None:
+    async def scenario() -> None:
+        # A single-connection pool: a leaked export connection would make
+        # the second acquire hang.
+        db = Database(DATABASE_URL, min_size=1, max_size=1)
+        await db.connect()
+        try:
+            for format in ("csv", "ndjson"):
+                export = SubmissionExport(
+                    db, format=format, fetch_rows=10, archive=_archive(tmp_path, [])
+                )
+                await _collect(export, chunks=2)
+                conn = await asyncio.wait_for(acquire_connection(db), 5)
+                await release_connection(db, conn)
+        finally:
+            await db.disconnect()
+
+    asyncio.run(scenario())
@@ -0,0 +1,41 @@
+import base64
+import datetime
+
+import pytest
+
+from schemas.submission import HistoryCursor
+
+
+def test_round_trip() -> None:
+    cursor = HistoryCursor(
+        date=datetime.date(2025, 5, 1), first_name="Zoë", last_name="O'Neil", id=42
+    )
+    token = cursor.encode()
+
+    assert HistoryCursor.decode(token) == cursor
+    # URL-safe and unpadded, so it can go in a query string as is.
+    assert "=" not in token and "+" not in token and "/" not in token
+
+
+@pytest.mark.parametrize("length", range(4))
+def test_decode_restores_any_padding(length: int) -> None:
+    cursor = HistoryCursor(
+        date=datetime.date(2025, 5, 1), first_name="A" * length, last_name="B", id=1
+    )
+    assert HistoryCursor.decode(cursor.encode()) == cursor
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "not-a-cursor",
+        base64.urlsafe_b64encode(
+            b'{"date": "yesterday", "first_name": "A", "last_name": "B", "id": 1}'
+        ).decode(),
+    ],
+)
+def test_invalid_tokens_raise_value_error(token: str) -> None:
+    # /history answers 400 for any ValueError from decode().
+    with pytest.raises(ValueError):
+        HistoryCursor.decode(token)
@@ -0,0 +1,73 @@
+import math
+
+import pytest
+
+from app.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_renders_total_family() -> None:
+    registry = Registry()
+    requests = Counter(
+        "requests", "Requests served.", ("route",), registry=registry
+    )
+    requests.labels("/history").inc()
+    requests.labels("/history").inc(2)
+    requests.labels('/a"b\\c\n').inc(0.5)
+
+    assert registry.render() == (
+        "# HELP requests_total Requests served.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/history"} 3\n'
+        'requests_total{route="/a\\"b\\\\c\\n"} 0.5\n'
+    )
+
+
+def test_gauge_reads_function_at_render_time() -> None:
+    registry = Registry()
+    gauge = Gauge("in_flight", "Requests in flight.", registry=registry)
+    gauge.set(3)
+    assert registry.render().splitlines()[-1] == "in_flight 3"
+
+    value = [7.0]
+    gauge.set_function(lambda: value[0])
+    value[0] = math.inf
+    assert registry.render().splitlines()[-1] == "in_flight +Inf"
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    registry = Registry()
+    histogram = Histogram(
+        "latency_seconds",
+        "Latency.",
+        ("op",),
+        buckets=(0.1, 1.0, math.inf),
+        registry=registry,
+    )
+    child = histogram.labels("read")
+    for value in (0.05, 0.1, 0.5, 2.0):
+        child.observe(value)
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{op="read",le="0.1"} 2',
+        'latency_seconds_bucket{op="read",le="1"} 3',
+        'latency_seconds_bucket{op="read",le="+Inf"} 4',
+        'latency_seconds_sum{op="read"} 2.65',
+        'latency_seconds_count{op="read"} 4',
+    ]
+    assert child.count == 4
+
+
+def test_histogram_timer_observes_once() -> None:
+    histogram = Histogram("timed_seconds", "Timed.", registry=Registry())
+    with histogram.time():
+        pass
+    assert histogram.labels().count == 1
+
+
+def test_duplicate_names_and_wrong_labels_are_rejected() -> None:
+    registry = Registry()
+    counter = Counter("errors", "Errors.", ("kind",), registry=registry)
+    with pytest.raises(ValueError):
+        Counter("errors", "Errors again.", registry=registry)
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
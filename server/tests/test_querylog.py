@@ -0,0 +1,78 @@
+from db.querylog import (
+    DbTime,
+    SlowQueryLog,
+    add_db_time,
+    current_db_time,
+    fingerprint,
+    mark_db_overloaded,
+)
+
+
+def test_fingerprint_replaces_literals_and_placeholders() -> None:
+    assert fingerprint(
+        "SELECT * FROM t WHERE a = 'it''s' AND b = 42 AND c = $1 AND d = %(d)s"
+    ) == "SELECT * FROM t WHERE a = ? AND b = ? AND c = ? AND d = ?"
+
+
+def test_fingerprint_keeps_identifiers_with_digits() -> None:
+    assert fingerprint("SELECT t1.c2 FROM t1 LIMIT 10") == "SELECT t1.c2 FROM t1 LIMIT ?"
+
+
+def test_fingerprint_collapses_whitespace_and_in_lists() -> None:
+    assert fingerprint(
+        "SELECT  *\n  FROM t\n WHERE id IN (1, 2, 3)"
+    ) == fingerprint("SELECT * FROM t WHERE id IN ($1, $2)")
+
+
+def test_fingerprint_shares_multi_row_values() -> None:
+    two = fingerprint("INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4)")
+    three = fingerprint("INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4), ($5, $6)")
+    assert two == three == "INSERT INTO t (a, b) VALUES (?+), ..."
+
+
+def test_slow_query_log_groups_by_fingerprint() -> None:
+    log = SlowQueryLog(threshold_ms=10, maxsize=10)
+    log.record("SELECT * FROM t WHERE id = 1", 5, 1, source="primary")
+    log.record("SELECT * FROM t WHERE id = 2", 20, 1, source="primary")
+    log.record("SELECT * FROM t WHERE id = 3", 40, 0, source="primary")
+
+    [entry] = log.snapshot()
+    assert entry["fingerprint"] == "SELECT * FROM t WHERE id = ?"
+    assert entry["calls"] == 2
+    assert entry["max_ms"] == 40
+    assert entry["avg_ms"] == 30
+    assert entry["last_rows"] == 0
+
+
+def test_slow_query_log_replaces_the_fastest_entry_when_full() -> None:
+    log = SlowQueryLog(threshold_ms=0, maxsize=2)
+    log.record("SELECT a FROM t", 30, None, source="primary")
+    log.record("SELECT b FROM t", 10, None, source="primary")
+    log.record("SELECT c FROM t", 5, None, source="primary")
+    assert [e["fingerprint"] for e in log.snapshot()] == [
+        "SELECT a FROM t",
+        "SELECT b FROM t",
+    ]
+
+    log.record("SELECT c FROM t", 20, None, source="primary")
+    assert [e["fingerprint"] for e in log.snapshot()] == [
+        "SELECT a FROM t",
+        "SELECT c FROM t",
+    ]
+
+
+def test_db_time_is_only_recorded_inside_a_request() -> None:
+    add_db_time(1.0)
+    mark_db_overloaded()
+
+    db_time = DbTime()
+    token = current_db_time.set(db_time)
+    try:
+        add_db_time(0.25)
+        add_db_time(0.5)
+        mark_db_overloaded()
+    finally:
+        current_db_time.reset(token)
+
+    assert db_time.seconds == 0.75
+    assert db_time.overloaded
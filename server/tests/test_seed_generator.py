@@ -0,0 +1,74 @@
+import datetime
+from collections import Counter
+from typing import Any, Dict
+
+import pytest
+
+from db.seed import SyntheticDataGenerator
+
+START = datetime.date(2025, 1, 1)
+
+
+def _generator(**options: Any) -> SyntheticDataGenerator:
+    defaults: Dict[str, Any] = dict(
+        first_names=["James", "Mary", "John"],
+        last_names=["Smith", "Jones"],
+        random_seed=42,
+        start_date=START,
+        days=30,
+    )
+    return SyntheticDataGenerator(**{**defaults, **options})
+
+
+def test_batches_are_reproducible_and_independent_of_order() -> None:
+    generator = _generator()
+    in_order = [generator.generate(batch_no, 50) for batch_no in range(3)]
+    reversed_order = [_generator().generate(batch_no, 50) for batch_no in (2, 1, 0)]
+
+    assert in_order == reversed_order[::-1]
+    assert in_order[0] != in_order[1]
+    assert _generator(random_seed=7).generate(0, 50) != in_order[0]
+
+
+def test_columns_stay_within_the_configured_range() -> None:
+    dates, first_names, last_names = _generator().generate(0, 500)
+
+    assert len(dates) == len(first_names) == len(last_names) == 500
+    assert all(isinstance(day, datetime.date) for day in dates)
+    assert min(dates) >= START
+    assert max(dates) < START + datetime.timedelta(days=30)
+    assert set(first_names) == {"James", "Mary", "John"}
+    assert set(last_names) == {"Smith", "Jones"}
+
+
+def test_cardinality_expands_names_without_whitespace() -> None:
+    generator = _generator(first_name_cardinality=7)
+    assert generator.first_pool.tolist() == [
+        "James", "Mary", "John", "James1", "Mary1", "John1", "James2"
+    ]
+
+
+def test_zipf_names_favour_the_first_ranks() -> None:
+    generator = _generator(
+        first_name_cardinality=50, name_distribution="zipf", zipf_exponent=1.5
+    )
+    counts = Counter(generator.generate(0, 5000)[1])
+    assert counts.most_common(1)[0][0] == "James"
+    assert counts["James"] > 5 * counts.get("Mary16", 0)
+
+
+def test_burst_days_get_more_rows() -> None:
+    generator = _generator(burst_days=2, burst_factor=50.0)
+    counts = Counter(generator.generate(0, 5000)[0])
+    busiest = {day for day, _ in counts.most_common(2)}
+    burst = {
+        START + datetime.timedelta(days=int(i))
+        for i, weight in enumerate(generator.day_weights)
+        if weight == generator.day_weights.max()
+    }
+    assert busiest == burst
+
+
+def test_unknown_distribution_is_rejected() -> None:
+    with pytest.raises(ValueError, match="Unknown name distribution"):
+        _generator(name_distribution="normal")